@@ -0,0 +1,174 @@
+"""
+Gerador de instâncias sintéticas do ETSPTW no formato dos arquivos de G/
+
+Cada arquivo segue exatamente o layout de G/nXwYsZ/nXwYsZ.k.txt: cabeçalho
+(n, m, Q, h, g), depósito, clientes, estações de recarga e matriz de
+distâncias, com as mesmas larguras de coluna e quebras de linha CRLF.
+As janelas de tempo seguem o procedimento de Dumas et al.: uma rota
+aleatória define o instante de chegada em cada cliente e a janela é
+centrada nele, com largura sorteada em [0, w].
+
+Uso:
+    python instance_generator.py --n 500 2000 --w 120 200 --s 5 10 --out G_sintetico
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+NO_EDGE = 99999  # valor da diagonal nos arquivos de G/
+BLOCK_ROWS = 512  # linhas da matriz calculadas/escritas por vez
+
+
+def family_name(n: int, w: int, s: int) -> str:
+    """Nome do diretório/arquivo no padrão de G/ (ex.: n20w120s5)"""
+    return f"n{n}w{w}s{s}"
+
+
+def _header_value(value, spec: str, width: int = 5) -> str:
+    """
+    Valor do cabeçalho no formato de G/ quando ele é exato; senão, a forma
+    mais curta que é lida de volta como o mesmo número
+    """
+    text = format(value, spec)
+    if float(text) == value:
+        return text
+    if float(value).is_integer():
+        return f"{int(value):{width}d}"
+    return f"{float(value)!r:>{width}}"
+
+
+def _floor_distances(xy: np.ndarray, rows: slice) -> np.ndarray:
+    """Distâncias euclidianas truncadas de um bloco de linhas para todos os nós"""
+    delta = xy[rows, None, :] - xy[None, :, :]
+    return np.floor(np.hypot(delta[..., 0], delta[..., 1])).astype(np.int64)
+
+
+def generate_instance(path: str, n: int, w: int, s: int, battery_capacity: float = None,
+                      consumption_rate: float = 1.0, recharging_rate: float = 0.25,
+                      grid_size: int = None, seed=None, include_matrix: bool = True) -> str:
+    """
+    Gera um arquivo de instância no formato de G/
+
+    Args:
+        path: Caminho do arquivo a ser escrito
+        n: Número de clientes
+        w: Largura máxima das janelas de tempo
+        s: Parâmetro de estações do nome da família (m = s - 1 estações, como em G/)
+        battery_capacity: Capacidade Q; se None, a menor que permite ir de qualquer
+            cliente à estação/depósito mais próximo e voltar
+        consumption_rate: Taxa de consumo h
+        recharging_rate: Taxa de recarga g
+        grid_size: Lado da região das coordenadas; se None, cresce com sqrt(n)
+            a partir de 50 (o tamanho usado em G/ para n=20)
+        seed: Semente (ou sequência de sementes) do gerador
+        include_matrix: Se False, omite o bloco da matriz (instância só com
+            coordenadas, lida por ETSPInstance com distâncias sob demanda)
+
+    Returns:
+        O caminho do arquivo gerado
+    """
+    rng = np.random.default_rng(seed)
+    m = max(s - 1, 0)
+    total_nodes = 1 + n + m
+    if grid_size is None:
+        grid_size = max(50, int(round(50 * np.sqrt(n / 20))))
+
+    xy = rng.integers(0, grid_size + 1, size=(total_nodes, 2)).astype(np.float64)
+    depot = xy[0]
+
+    # Janelas de tempo centradas na chegada de uma rota aleatória pelos clientes
+    tour = 1 + rng.permutation(n)
+    route = xy[np.r_[0, tour]]
+    legs = np.floor(np.hypot(*np.diff(route, axis=0).T))
+    arrival = np.zeros(total_nodes)
+    arrival[tour] = np.cumsum(legs)
+    half_width = rng.integers(0, w + 1, size=total_nodes) / 2
+    ready = np.maximum(0, np.floor(arrival - half_width)).astype(np.int64)
+    due = np.ceil(arrival + half_width).astype(np.int64)
+
+    # Horizonte: voltar ao depósito depois da última janela de cliente
+    back_home = np.floor(np.hypot(*(xy[1:n + 1] - depot).T))
+    horizon = int(np.max(due[1:n + 1] + back_home)) if n else 0
+    ready[0], due[0] = 0, horizon
+    ready[n + 1:], due[n + 1:] = 0, horizon
+
+    if battery_capacity is None:
+        chargers = np.r_[0, np.arange(n + 1, total_nodes)]
+        nearest = np.min(np.hypot(*(xy[1:n + 1, None, :] - xy[None, chargers, :]).transpose(2, 0, 1)),
+                         axis=1) if n else np.zeros(1)
+        battery_capacity = int(np.ceil(2 * consumption_rate * nearest.max()))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'w', newline='') as file:
+        file.write(f"{n:5d}\r\n{m:5d}\r\n{_header_value(battery_capacity, '5g')}\r\n"
+                   f"{_header_value(consumption_rate, '5.1f')}\r\n"
+                   f"{_header_value(recharging_rate, '5.2f')}\r\n\r\n")
+
+        ids = np.arange(total_nodes)
+        coords = xy.astype(np.int64)
+        for block in (slice(0, 1), slice(1, n + 1), slice(n + 1, total_nodes)):
+            for i in ids[block]:
+                file.write(f"{i:3d} {coords[i, 0]:3d} {coords[i, 1]:3d} "
+                           f"{ready[i]:5d} {due[i]:5d}\r\n")
+            if include_matrix or block.start < n + 1:
+                file.write("\r\n")
+
+        if include_matrix:
+            for start in range(0, total_nodes, BLOCK_ROWS):
+                rows = slice(start, min(start + BLOCK_ROWS, total_nodes))
+                block = _floor_distances(xy, rows)
+                block[np.arange(block.shape[0]), np.arange(rows.start, rows.stop)] = NO_EDGE
+                np.savetxt(file, block, fmt='%6d', delimiter='', newline='\r\n')
+
+    return path
+
+
+def generate_family(root: str, n: int, w: int, s: int, count: int = 5, seed: int = 0,
+                    **kwargs) -> list:
+    """
+    Gera uma família no layout de G/: root/nXwYsZ/nXwYsZ.1.txt ... .count.txt
+
+    A semente de cada arquivo depende de (seed, n, w, s, k), então famílias
+    podem ser geradas em qualquer ordem e sempre reproduzem os mesmos arquivos.
+    """
+    name = family_name(n, w, s)
+    paths = []
+    for k in range(1, count + 1):
+        path = os.path.join(root, name, f"{name}.{k}.txt")
+        paths.append(generate_instance(path, n, w, s, seed=[seed, n, w, s, k], **kwargs))
+    return paths
+
+
+def generate_benchmark(root: str, customer_counts, window_widths, station_counts,
+                       count: int = 5, seed: int = 0, **kwargs) -> list:
+    """Gera todas as famílias do produto cartesiano (n, w, s), como em G/"""
+    paths = []
+    for n in customer_counts:
+        for w in window_widths:
+            for s in station_counts:
+                paths.extend(generate_family(root, n, w, s, count, seed, **kwargs))
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera instâncias ETSPTW no formato de G/")
+    parser.add_argument('--n', type=int, nargs='+', default=[20], help="número(s) de clientes")
+    parser.add_argument('--w', type=int, nargs='+', default=[120], help="largura(s) das janelas")
+    parser.add_argument('--s', type=int, nargs='+', default=[5], help="parâmetro de estações")
+    parser.add_argument('--count', type=int, default=5, help="instâncias por família")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--battery', type=float, default=None, help="capacidade Q")
+    parser.add_argument('--no-matrix', action='store_true',
+                        help="omite a matriz (instâncias só com coordenadas)")
+    parser.add_argument('--out', default='G_sintetico', help="diretório de saída")
+    args = parser.parse_args()
+
+    generated = generate_benchmark(args.out, args.n, args.w, args.s, args.count, args.seed,
+                                   battery_capacity=args.battery,
+                                   include_matrix=not args.no_matrix)
+    print(f"{len(generated)} instâncias geradas em {args.out}")
@@ -1,21 +1,523 @@
+from abc import ABC, abstractmethod
+import hashlib
+import os
+import tempfile
+import warnings
+
 import numpy as np
 
+CACHE_SUFFIX = '.cache.npz'
+MATRIX_SUFFIX = '.matrix.npy'
+CACHE_VERSION = 5
+
+# Node kinds (ETSPInstance.kind)
+NODE_DEPOT = 0
+NODE_CUSTOMER = 1
+NODE_STATION = 2
+
+# Supported file formats and the extensions batch runners should pick up
+INSTANCE_FORMATS = ('g', 'tsplib', 'dumas')
+INSTANCE_EXTENSIONS = ('.txt', '.tsp')
+
+# Distance rounding each format prescribes for coordinate-only instances
+FORMAT_ROUNDING = {'tsplib': 'round', 'dumas': 'floor'}
+
+TSPLIB_SECTIONS = ('NODE_COORD_SECTION', 'EDGE_WEIGHT_SECTION', 'DISPLAY_DATA_SECTION')
+
+def detect_format(text):
+    """Guess the instance format ('g', 'tsplib' or 'dumas') from the file contents"""
+    head = text.lstrip()[:4096]
+    if any(section in head for section in TSPLIB_SECTIONS) or head.startswith('NAME'):
+        return 'tsplib'
+    if head.startswith('!!') or 'CUST NO' in head:
+        return 'dumas'
+    return 'g'
+
+def compact_dtype(matrix):
+    """Smallest dtype that holds matrix exactly: int16/int32 for integral values, else its own"""
+    if matrix.size == 0 or matrix.dtype.kind in 'iu':
+        return matrix.dtype
+    if not np.isfinite(matrix).all() or (np.mod(matrix, 1) != 0).any():
+        return matrix.dtype
+    low, high = matrix.min(), matrix.max()
+    for candidate in (np.int16, np.int32):
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return np.dtype(candidate)
+    return matrix.dtype
+
+class DistanceProvider(ABC):
+    """Distance lookups by matrix row, indexed like a NumPy matrix.
+    
+    provider[i, j] (ints or broadcastable arrays of rows), provider[i][j],
+    provider[rows] and slices behave as on the dense matrix, so GA and local
+    search code can use either interchangeably.
+    """
+    shape = (0, 0)
+    dtype = np.dtype(np.float64)
+    
+    @abstractmethod
+    def pairs(self, from_rows, to_rows):
+        """Elementwise distances between broadcastable arrays of rows"""
+    
+    def rows(self, rows):
+        """Full rows of the matrix, shape (len(rows), N)"""
+        return self.tile(rows, np.arange(self.shape[1]))
+    
+    def tile(self, rows, cols):
+        """Block of the matrix, shape (len(rows), len(cols))"""
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        return self.pairs(rows[:, None], cols[None, :])
+    
+    @abstractmethod
+    def subset(self, rows):
+        """Provider restricted to rows (renumbered 0..len(rows)-1)"""
+    
+    def __len__(self):
+        return self.shape[0]
+    
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        if len(key) != 2:
+            raise IndexError("distance providers are two-dimensional")
+        
+        rows, cols = (np.arange(size)[k] if isinstance(k, slice) else np.asarray(k, dtype=np.intp)
+                      for k, size in zip(key, self.shape))
+        if isinstance(key[0], slice) or isinstance(key[1], slice):
+            # Fatia em algum eixo: bloco, como no NumPy
+            return self.tile(np.atleast_1d(rows), np.atleast_1d(cols)).reshape(rows.shape + cols.shape)
+        return self.pairs(rows, cols)
+
+
+class DenseDistances(DistanceProvider):
+    """Provider over a full in-memory (or memory-mapped) matrix"""
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.shape = matrix.shape
+        self.dtype = matrix.dtype
+    
+    def pairs(self, from_rows, to_rows):
+        return self.matrix[from_rows, to_rows]
+    
+    def rows(self, rows):
+        return self.matrix[rows]
+    
+    def tile(self, rows, cols):
+        return self.matrix[np.ix_(rows, cols)]
+    
+    def subset(self, rows):
+        return DenseDistances(self.matrix[np.ix_(rows, rows)])
+    
+    def __getitem__(self, key):
+        return self.matrix[key]
+
+
+class EuclideanDistances(DistanceProvider):
+    """Provider computing distances from coordinates on demand, O(N) memory.
+    
+    rounding: 'floor' (truncation, the Dumas convention), 'round' (nearest
+    integer, TSPLIB) or None (exact). The diagonal is 0. The G files carry
+    their own matrix block, which does not match floored distances in every
+    cell and uses 99999 on the diagonal, so this provider only stands in
+    for files without a matrix.
+    """
+    def __init__(self, x, y, rounding='floor'):
+        if rounding not in ('floor', 'round', None):
+            raise ValueError(f"Unknown rounding: {rounding}")
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.rounding = rounding
+        self.shape = (len(self.x), len(self.x))
+    
+    def pairs(self, from_rows, to_rows):
+        distance = np.hypot(self.x[from_rows] - self.x[to_rows], self.y[from_rows] - self.y[to_rows])
+        if self.rounding == 'floor':
+            return np.floor(distance)
+        if self.rounding == 'round':
+            return np.floor(distance + 0.5)
+        return distance
+    
+    def subset(self, rows):
+        return EuclideanDistances(self.x[rows], self.y[rows], self.rounding)
+
+
+def _write_atomic(path, write):
+    """Write a file through a unique temp file in the same directory, then rename it"""
+    directory, name = os.path.split(path)
+    # Nome temporario unico: varios processos podem gravar o mesmo sidecar ao mesmo tempo
+    handle, tmp_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class ETSPInstance:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_cache=True, mmap_mode=None, dtype=None, rounding='floor',
+                 file_format=None):
+        """
+        Args:
+            file_path: instance text file
+            use_cache: load from / write the binary sidecars next to the file
+            mmap_mode: e.g. 'r' to memory-map the distance matrix from its
+                .npy sidecar instead of loading it into RAM (implies the cache)
+            dtype: distance matrix dtype policy. None keeps float64 (or the
+                sidecar dtype when memory-mapped), 'auto' uses the smallest
+                exact dtype (int16/int32 for integral matrices), anything
+                else (e.g. 'float32') is cast to. Tour lengths must be
+                accumulated in a wide type, e.g. sum(dtype=np.float64), since
+                int16/int32/float32 sums overflow or lose precision.
+            rounding: used when the file has no matrix block and distances
+                are computed from coordinates (see EuclideanDistances);
+                TSPLIB and Dumas files use their own convention
+            file_format: 'g', 'tsplib' or 'dumas'; detected when None
+        
+        Files without a matrix block leave distance_matrix as None; use
+        distances (or get_distance(s)/submatrix) in that case.
+        
+        Every format is loaded into the same representation: row 0 is the
+        depot, rows 1..n the customers, rows n+1..n+m the stations, with IDs
+        equal to rows. Formats without a battery get Q = inf, h = g = 0 and
+        formats without time windows get [0, inf).
+        """
         self.file_path = file_path
+        self.cache_path = file_path + CACHE_SUFFIX
+        self.matrix_path = file_path + MATRIX_SUFFIX
+        self.mmap_mode = mmap_mode
+        self.dtype = dtype
         self.n = 0  # number of customers
         self.m = 0  # number of recharging stations
         self.Q = 0  # battery capacity
         self.h = 0.0  # consumption rate
         self.g = 0.0  # recharging rate
-        self.nodes = []  # list of nodes: depot, customers, recharging stations
+        # Node data as parallel arrays (one entry per matrix row):
+        # depot, customers, recharging stations
+        self.ids = np.empty(0, dtype=np.int64)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.ready = np.empty(0)  # time window start (e)
+        self.due = np.empty(0)  # time window end (l)
+        self.kind = np.empty(0, dtype=np.int8)  # NODE_DEPOT / NODE_CUSTOMER / NODE_STATION
+        self._nodes = None  # lazily built list of dicts, see nodes
         self.distance_matrix = None
+        self.rounding = rounding
+        self.file_format = file_format
+        if file_format not in (None,) + INSTANCE_FORMATS:
+            raise ValueError(f"Unknown instance format: {file_format}")
+        self._index = {}  # node ID -> matrix row
+        self._row_of_id = None  # same lookup as an array, for vectorized access
         
-        self._read_instance()
+        use_cache = use_cache or mmap_mode is not None
+        if not (use_cache and self._load_cache()):
+            data = self._read_instance()
+            saved = use_cache and self._save_cache(data)
+            if mmap_mode is not None and self.distance_matrix is not None:
+                if saved:
+                    # Troca a copia recem-lida pelas paginas compartilhadas do arquivo
+                    self.distance_matrix = np.load(self.matrix_path, mmap_mode=mmap_mode)
+                elif not self._load_cache():
+                    # Sem sidecar proprio nem um valido gravado por outro processo
+                    print(f"Warning: could not write {self.matrix_path}, "
+                          f"distance matrix kept in memory")
+        if self.distance_matrix is not None:
+            self.distance_matrix = self._apply_dtype(self.distance_matrix)
+        self.rounding = FORMAT_ROUNDING.get(self.file_format, self.rounding)
+        self._build_index()
+    
+    @property
+    def distances(self):
+        """Distance provider over all nodes (dense matrix or computed from coordinates)"""
+        if self.distance_matrix is not None:
+            return DenseDistances(self.distance_matrix)
+        return EuclideanDistances(self.x, self.y, self.rounding)
+    
+    def _apply_dtype(self, matrix):
+        """Cast the distance matrix according to the dtype policy"""
+        if self.dtype is None:
+            target = matrix.dtype if isinstance(matrix, np.memmap) else np.dtype(np.float64)
+        elif self.dtype == 'auto':
+            # O sidecar ja e gravado no menor dtype exato
+            target = matrix.dtype if isinstance(matrix, np.memmap) else compact_dtype(matrix)
+        else:
+            target = np.dtype(self.dtype)
+        
+        if matrix.dtype == target:
+            return matrix
+        return matrix.astype(target)
+    
+    def __getstate__(self):
+        # Em modo mmap, outros processos reabrem o .npy em vez de receber uma copia;
+        # uma matriz convertida de dtype (astype) ja nao e o arquivo e vai junto
+        state = self.__dict__.copy()
+        if getattr(self.distance_matrix, 'filename', None) is not None:
+            state['distance_matrix'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.distance_matrix is None and self.mmap_mode is not None:
+            self.distance_matrix = self._apply_dtype(
+                np.load(self.matrix_path, mmap_mode=self.mmap_mode))
     
     def _read_instance(self):
-        with open(self.file_path, 'r') as file:
-            lines = [line.strip() for line in file.readlines() if line.strip()]
+        """Parse the text file; returns its raw bytes (used to key the cache)"""
+        with open(self.file_path, 'rb') as file:
+            data = file.read()
+        text = data.decode()
+        
+        if self.file_format is None:
+            self.file_format = detect_format(text)
+        
+        if self.file_format == 'tsplib':
+            self._parse_tsplib(text)
+        elif self.file_format == 'dumas' or not self._parse_bulk(text):
+            # Caminho rapido (_parse_bulk): um unico parse NumPy do arquivo inteiro
+            if not self._parse_dumas(text):
+                self._parse_lines(text.splitlines())
+        return data
+    
+    def _load_cache(self):
+        """Load from the binary sidecar if it matches the text file.
+        
+        The sidecar is valid when size and mtime match; if only the mtime
+        changed (file touched or copied), the content hash decides. The
+        matrix lives in its own .npy so it can be memory-mapped.
+        """
+        try:
+            stat = os.stat(self.file_path)
+            with np.load(self.cache_path, allow_pickle=False) as cache:
+                cached = {key: cache[key] for key in cache.files}
+        except Exception:
+            return False
+        
+        try:
+            version, size, mtime_ns, has_matrix = cached['key'].tolist()
+            if version != CACHE_VERSION or size != stat.st_size:
+                return False
+            if mtime_ns != stat.st_mtime_ns:
+                with open(self.file_path, 'rb') as file:
+                    if hashlib.sha1(file.read()).hexdigest() != str(cached['sha1']):
+                        return False
+            
+            self.file_format = str(cached['file_format'])
+            header = cached['header']
+            self.n, self.m = int(header[0]), int(header[1])
+            self.Q, self.h, self.g = float(header[2]), float(header[3]), float(header[4])
+            self._set_nodes(cached['ids'], cached['x'], cached['y'], cached['e'], cached['l'])
+            if not has_matrix:
+                return True
+            matrix = np.load(self.matrix_path, mmap_mode=self.mmap_mode, allow_pickle=False)
+        except (OSError, KeyError, ValueError, IndexError):
+            return False
+        
+        total_nodes = 1 + self.n + self.m
+        if matrix.shape != (total_nodes, total_nodes):
+            return False
+        self.distance_matrix = matrix
+        return True
+    
+    def _save_cache(self, data):
+        """Write the parsed instance next to the text file (best effort)"""
+        try:
+            stat = os.stat(self.file_path)
+            # Matriz primeiro: o .npz so aparece quando o .npy ja esta completo
+            has_matrix = self.distance_matrix is not None
+            if has_matrix:
+                matrix = self.distance_matrix
+                _write_atomic(self.matrix_path,
+                              lambda file: np.save(file, matrix.astype(compact_dtype(matrix), copy=False)))
+            
+            _write_atomic(self.cache_path, lambda file: np.savez(
+                file,
+                key=np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns, has_matrix],
+                             dtype=np.int64),
+                sha1=np.array(hashlib.sha1(data).hexdigest()),
+                file_format=np.array(self.file_format),
+                header=np.array([self.n, self.m, self.Q, self.h, self.g], dtype=np.float64),
+                ids=self.ids,
+                x=self.x,
+                y=self.y,
+                e=self.ready,
+                l=self.due,
+            ))
+        except OSError:
+            # Diretorio somente leitura etc.: segue sem cache
+            return False
+        return True
+    
+    def _parse_bulk(self, text):
+        """Parse header, node block and matrix with one NumPy call.
+        
+        Returns False (leaving the instance untouched) when the file does not
+        have the exact G layout, so the line-based parser can handle it.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            try:
+                values = np.fromstring(text, dtype=np.float64, sep=' ')
+            except (ValueError, DeprecationWarning):
+                return False
+        
+        if len(values) < 5 or values[0] != int(values[0]) or values[1] != int(values[1]):
+            return False
+        
+        # Calcular total de nos e conferir o tamanho dos blocos
+        total_nodes = 1 + int(values[0]) + int(values[1])
+        nodes_end = 5 + 5 * total_nodes
+        if len(values) not in (nodes_end, nodes_end + total_nodes * total_nodes):
+            return False
+        
+        node_block = values[5:nodes_end].reshape(total_nodes, 5)
+        ids = node_block[:, 0].astype(np.int64)
+        if (ids != node_block[:, 0]).any():
+            return False
+        
+        self.n = int(values[0])
+        self.m = int(values[1])
+        self.Q = float(values[2])
+        self.h = float(values[3])
+        self.g = float(values[4])
+        self._set_nodes(ids, node_block[:, 1], node_block[:, 2], node_block[:, 3], node_block[:, 4])
+        if len(values) > nodes_end:
+            self.distance_matrix = values[nodes_end:].reshape(total_nodes, total_nodes)
+        return True
+    
+    def _parse_tsplib(self, text):
+        """TSPLIB TSP file with EDGE_WEIGHT_TYPE EUC_2D or EXPLICIT; node 1 is the depot"""
+        spec = {}
+        sections = {}
+        current = None
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line == 'EOF':
+                continue
+            keyword = line.split(':')[0].strip()
+            if keyword in TSPLIB_SECTIONS:
+                current = sections.setdefault(keyword, [])
+            elif ':' in line and keyword.replace('_', '').isalpha():
+                spec[keyword] = line.split(':', 1)[1].strip()
+                current = None
+            elif current is not None:
+                current.append(line)
+        
+        def section_values(name, columns):
+            values = np.array(' '.join(sections[name]).split(), dtype=np.float64)
+            return values.reshape(-1, columns) if columns else values
+        
+        total_nodes = int(spec['DIMENSION'])
+        weight_type = spec.get('EDGE_WEIGHT_TYPE', 'EUC_2D')
+        
+        coords = np.zeros((total_nodes, 2))
+        for name in ('NODE_COORD_SECTION', 'DISPLAY_DATA_SECTION'):
+            if name in sections:
+                coords = section_values(name, 3)[:, 1:3]
+                break
+        
+        if weight_type == 'EUC_2D':
+            if 'NODE_COORD_SECTION' not in sections:
+                raise ValueError(f"{self.file_path}: EUC_2D without NODE_COORD_SECTION")
+            self.distance_matrix = None  # nint(euclidiana), calculada sob demanda
+        elif weight_type == 'EXPLICIT':
+            self.distance_matrix = self._tsplib_explicit_matrix(
+                section_values('EDGE_WEIGHT_SECTION', None), total_nodes,
+                spec.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX'))
+        else:
+            raise ValueError(f"{self.file_path}: unsupported EDGE_WEIGHT_TYPE {weight_type}")
+        
+        self.n, self.m = total_nodes - 1, 0
+        self.Q, self.h, self.g = float('inf'), 0.0, 0.0
+        self._set_nodes(np.arange(total_nodes), coords[:, 0], coords[:, 1],
+                        np.zeros(total_nodes), np.full(total_nodes, np.inf))
+    
+    @staticmethod
+    def _tsplib_explicit_matrix(weights, size, weight_format):
+        """Expand an EDGE_WEIGHT_SECTION into a full symmetric matrix"""
+        if weight_format == 'FULL_MATRIX':
+            return weights[:size * size].reshape(size, size)
+        
+        # *_COL de um triangulo equivale a *_ROW do outro
+        weight_format = {'UPPER_COL': 'LOWER_ROW', 'LOWER_COL': 'UPPER_ROW',
+                         'UPPER_DIAG_COL': 'LOWER_DIAG_ROW',
+                         'LOWER_DIAG_COL': 'UPPER_DIAG_ROW'}.get(weight_format, weight_format)
+        triangles = {
+            'UPPER_ROW': lambda: np.triu_indices(size, 1),
+            'LOWER_ROW': lambda: np.tril_indices(size, -1),
+            'UPPER_DIAG_ROW': lambda: np.triu_indices(size),
+            'LOWER_DIAG_ROW': lambda: np.tril_indices(size),
+        }
+        if weight_format not in triangles:
+            raise ValueError(f"Unsupported EDGE_WEIGHT_FORMAT {weight_format}")
+        
+        rows, cols = triangles[weight_format]()
+        matrix = np.zeros((size, size))
+        matrix[rows, cols] = weights[:len(rows)]
+        matrix[cols, rows] = weights[:len(rows)]
+        return matrix
+    
+    def _parse_dumas(self, text):
+        """Dumas et al. TSPTW files; returns False if the text is neither layout.
+        
+        Original layout: 'CUST NO. XCOORD. YCOORD. DEMAND READY TIME DUE DATE
+        SERVICE TIME' rows ending with customer 999; the first row is the
+        depot and travel times are truncated Euclidean distances. Also reads
+        the matrix layout (N, N x N travel times, N ready/due pairs).
+        """
+        rows = []
+        if 'CUST NO' in text:
+            for line in text.splitlines():
+                parts = line.split()
+                if len(parts) >= 7 and parts[0].isdigit():
+                    if int(parts[0]) == 999:
+                        break
+                    rows.append([float(part) for part in parts[:7]])
+        
+        if rows:
+            table = np.array(rows)
+            total_nodes = len(table)
+            service = table[:, 6]
+            if service.any():
+                # Tempo de servico somado aos arcos de saida: d'(i, j) = d(i, j) + s_i
+                self.distance_matrix = (EuclideanDistances(table[:, 1], table[:, 2], 'floor')[:, :]
+                                        + service[:, None])
+            else:
+                self.distance_matrix = None
+            coords, windows = table[:, 1:3], table[:, 4:6]
+        else:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                try:
+                    values = np.fromstring(text, dtype=np.float64, sep=' ')
+                except (ValueError, DeprecationWarning):
+                    return False
+            if len(values) < 1 or values[0] != int(values[0]):
+                return False
+            total_nodes = int(values[0])
+            if len(values) != 1 + total_nodes * total_nodes + 2 * total_nodes:
+                return False
+            
+            matrix_end = 1 + total_nodes * total_nodes
+            self.distance_matrix = values[1:matrix_end].reshape(total_nodes, total_nodes)
+            coords = np.zeros((total_nodes, 2))
+            windows = values[matrix_end:].reshape(total_nodes, 2)
+        
+        self.file_format = 'dumas'
+        self.n, self.m = total_nodes - 1, 0
+        self.Q, self.h, self.g = float('inf'), 0.0, 0.0
+        self._set_nodes(np.arange(total_nodes), coords[:, 0], coords[:, 1],
+                        windows[:, 0], windows[:, 1])
+        return True
+    
+    def _parse_lines(self, raw_lines):
+        """Line-by-line parser, tolerant to extra columns and short lines"""
+        lines = [line.strip() for line in raw_lines if line.strip()]
             
         # Ler parametros
         self.n = int(lines[0])      # number of customers
@@ -30,7 +532,7 @@ class ETSPInstance:
         # Ler informacoes dos nos
         nodes_start_i = 5
         nodes_end_i = nodes_start_i + total_nodes
-        self.nodes = []
+        nodes = []
         
         for i in range(nodes_start_i, nodes_end_i):
             parts = lines[i].split()
@@ -40,16 +542,17 @@ class ETSPInstance:
                 y = float(parts[2])     # y coordinate
                 e = float(parts[3])     # time window start
                 l = float(parts[4])     # time window end
-                self.nodes.append({
-                    'id': node_id,
-                    'x': x,
-                    'y': y,
-                    'e': e,
-                    'l': l
-                })
-        
-        # Ler distancias matrix
+                nodes.append((node_id, x, y, e, l))
+        
+        ids, x, y, e, l = zip(*nodes) if nodes else ([],) * 5
+        self._set_nodes(np.array(ids, dtype=np.int64), np.array(x, dtype=np.float64),
+                        np.array(y, dtype=np.float64), np.array(e, dtype=np.float64),
+                        np.array(l, dtype=np.float64))
+        
+        # Ler distancias matrix (ausente: distancias calculadas das coordenadas)
         matrix_lines = lines[nodes_end_i:]
+        if not matrix_lines:
+            return
         matrix_data = []
         
         for line in matrix_lines:
@@ -64,30 +567,217 @@ class ETSPInstance:
             print(f"Warning: Expected matrix size {expected_size}x{expected_size}, "
                   f"got {self.distance_matrix.shape}")
     
+    def _set_nodes(self, ids, x, y, e, l):
+        """Store node attributes as contiguous arrays; kind follows the row order"""
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.ready = np.ascontiguousarray(e, dtype=np.float64)
+        self.due = np.ascontiguousarray(l, dtype=np.float64)
+        
+        rows = np.arange(len(self.ids))
+        self.kind = np.where(rows == 0, NODE_DEPOT,
+                             np.where(rows <= self.n, NODE_CUSTOMER, NODE_STATION)).astype(np.int8)
+        self._nodes = None
+    
+    @property
+    def nodes(self):
+        """Nodes as a list of dicts ('id', 'x', 'y', 'e', 'l'), kept for compatibility"""
+        if self._nodes is None:
+            self._nodes = [
+                {'id': node_id, 'x': xi, 'y': yi, 'e': ei, 'l': li}
+                for node_id, xi, yi, ei, li in zip(self.ids.tolist(), self.x.tolist(),
+                                                   self.y.tolist(), self.ready.tolist(),
+                                                   self.due.tolist())
+            ]
+        return self._nodes
+    
+    def _build_index(self):
+        """Build the node ID -> matrix row lookup tables"""
+        ids = self.ids.tolist()
+        self._index = {node_id: i for i, node_id in enumerate(ids)}
+        
+        self._row_of_id = np.full(max(ids, default=-1) + 1, -1, dtype=np.intp)
+        self._row_of_id[ids] = np.arange(len(ids))
+    
     def get_node_info(self, node_id):
         """Get information for a specific node by ID"""
-        for node in self.nodes:
-            if node['id'] == node_id:
-                return node
-        return None
+        i = self._index.get(node_id)
+        if i is None:
+            return None
+        return {'id': int(self.ids[i]), 'x': float(self.x[i]), 'y': float(self.y[i]),
+                'e': float(self.ready[i]), 'l': float(self.due[i])}
+    
+    def get_node_rows(self, node_ids):
+        """Row indices (into the node arrays and distance_matrix) for an array of node IDs"""
+        return self._get_matrix_indices(node_ids)
     
     def get_distance(self, from_id, to_id):
         """Get distance between two nodes by their IDs"""
         from_idx = self._get_matrix_index(from_id)
         to_idx = self._get_matrix_index(to_id)
+        if self.distance_matrix is None:
+            return self.distances[from_idx, to_idx]
         return self.distance_matrix[from_idx][to_idx]
     
+    def get_distances(self, from_ids, to_ids):
+        """Get distances between pairs of node IDs as a NumPy array (IDs broadcast like arrays)"""
+        from_idx = self._get_matrix_indices(from_ids)
+        to_idx = self._get_matrix_indices(to_ids)
+        return self.distances.pairs(from_idx, to_idx)
+    
+    def submatrix(self, node_ids):
+        """Distance matrix restricted to node_ids (in the given order).
+        
+        Returns a view of distance_matrix when the IDs map to consecutive rows,
+        otherwise a single fancy-index gather. Views must not be written to.
+        Without a matrix, returns an EuclideanDistances provider instead.
+        """
+        rows = self._get_matrix_indices(node_ids)
+        if rows.ndim != 1:
+            raise ValueError("node_ids must be one-dimensional")
+        if self.distance_matrix is None:
+            return self.distances.subset(rows)
+        
+        if len(rows) and (rows == np.arange(rows[0], rows[0] + len(rows))).all():
+            return self.distance_matrix[rows[0]:rows[0] + len(rows), rows[0]:rows[0] + len(rows)]
+        return self.distance_matrix[np.ix_(rows, rows)]
+    
+    def is_symmetric(self):
+        """True if d(i, j) == d(j, i) for every pair of nodes (computed once)"""
+        if getattr(self, '_symmetric', None) is None:
+            matrix = self.distance_matrix
+            self._symmetric = matrix is None or bool(np.array_equal(matrix, matrix.T))
+        return self._symmetric
+    
+    def station_table(self):
+        """Best recharging station for every depot/customer arc (computed once).
+        
+        Returns (station, detour, reachable), each (n+1) x (n+1):
+        station[i, j] is the station row minimizing d(i,s) + d(s,j) - d(i,j)
+        among the stations usable on that arc (both legs drivable on a full
+        battery, h * d <= Q), or -1 if there is none; detour[i, j] is that
+        detour (inf if none); reachable[i, j] is True when h * d(i,j) <= Q,
+        i.e. the arc can be driven without a recharge on the way. Without
+        stations or with Q = inf the constant tables are read-only views.
+        """
+        if getattr(self, '_station_table', None) is None:
+            self._station_table = self._build_station_table()
+        return self._station_table
+    
+    def _build_station_table(self, block_rows=256):
+        size = self.n + 1
+        nodes = np.arange(size)
+        stations = np.flatnonzero(self.kind == NODE_STATION)
+        distances = self.distances
+        if len(stations) == 0 or not np.isfinite(self.Q):
+            # Nenhuma parada possivel ou necessaria: visoes constantes, sem matrizes densas
+            station = np.broadcast_to(np.intp(-1), (size, size))
+            detour = np.broadcast_to(np.inf, (size, size))
+            if not np.isfinite(self.Q):
+                return station, detour, np.broadcast_to(True, (size, size))
+        else:
+            station = np.empty((size, size), dtype=np.intp)
+            detour = np.empty((size, size))
+            # Trechos ate/desde a estacao que nao cabem numa carga completa ficam infinitos
+            to_station = distances.tile(nodes, stations).astype(np.float64)
+            to_station[self.h * to_station > self.Q] = np.inf
+            from_station = distances.tile(stations, nodes).astype(np.float64)
+            from_station[self.h * from_station > self.Q] = np.inf
+        
+        reachable = np.empty((size, size), dtype=bool)
+        for start in range(0, size, block_rows):
+            block = slice(start, min(start + block_rows, size))
+            direct = distances.tile(nodes[block], nodes)
+            reachable[block] = self.h * direct <= self.Q
+            if len(stations) == 0:
+                continue
+            via = to_station[block, :, None] + from_station[None, :, :]  # bloco x m x (n+1)
+            best = np.argmin(via, axis=1)
+            cost = np.take_along_axis(via, best[:, None, :], axis=1)[:, 0, :]
+            usable = np.isfinite(cost)
+            station[block] = np.where(usable, stations[best], -1)
+            detour[block] = np.where(usable, cost - direct, np.inf)
+        return station, detour, reachable
+    
+    def tightened_windows(self, max_rounds=20):
+        """Time windows of the depot/customers narrowed by the classic rules (computed once).
+        
+        A customer cannot start before the earliest arrival from any node that
+        can precede it, nor later than the latest start from which some node
+        can still be reached in time:
+        
+            e_k = max(e_k, min(l_k, min_i e_i + d(i, k)))
+            l_k = min(l_k, max(e_k, max_j l_j - d(k, j)))
+        
+        over the arcs allowed by the current windows (e_i + d(i, j) <= l_j),
+        repeated until nothing changes. The depot window is kept, and
+        unbounded windows (l = inf, e.g. TSPLIB) stay unbounded.
+        Returns (ready, due) arrays of length n + 1.
+        """
+        if getattr(self, '_tightened', None) is None:
+            size = self.n + 1
+            nodes = np.arange(size)
+            distance = self.distances.tile(nodes, nodes).astype(np.float64)
+            np.fill_diagonal(distance, np.inf)
+            ready, due = self.ready[:size].copy(), self.due[:size].copy()
+            customers = nodes[1:]
+            bounded = np.isfinite(due)[None, :]
+            for _ in range(max_rounds):
+                allowed = ready[:, None] + distance <= due[None, :]
+                np.fill_diagonal(allowed, False)
+                arrival = np.where(allowed, ready[:, None] + distance, np.inf).min(axis=0)
+                # Janela sem fim (l = inf) nao limita a saida; evita inf - inf
+                latest = np.subtract(due[None, :], distance, out=np.full(distance.shape, np.inf),
+                                     where=bounded)
+                departure = np.where(allowed, latest, -np.inf).max(axis=1)
+                new_ready = np.maximum(ready, np.minimum(due, arrival))
+                new_due = np.minimum(due, np.maximum(new_ready, departure))
+                new_ready[0], new_due[0] = ready[0], due[0]
+                if (np.array_equal(new_ready[customers], ready[customers])
+                        and np.array_equal(new_due[customers], due[customers])):
+                    break
+                ready, due = new_ready, new_due
+            self._tightened = (ready, due)
+        return self._tightened
+    
+    def arc_mask(self):
+        """Boolean (n+1) x (n+1) mask of the depot/customer arcs i -> j that can
+        appear in a time-feasible tour (computed once).
+        
+        An arc is pruned when even leaving i at its earliest start misses the
+        window of j, e_i + d(i, j) > l_j, using the tightened windows; the
+        diagonal is always False. Service times are zero in every supported
+        format, so they do not appear in the rule.
+        """
+        if getattr(self, '_arc_mask', None) is None:
+            ready, due = self.tightened_windows()
+            nodes = np.arange(self.n + 1)
+            mask = ready[:, None] + self.distances.tile(nodes, nodes) <= due[None, :]
+            np.fill_diagonal(mask, False)
+            self._arc_mask = mask
+        return self._arc_mask
+    
     def _get_matrix_index(self, node_id):
         """Convert node ID to matrix index (0-based)"""
-        for i, node in enumerate(self.nodes):
-            if node['id'] == node_id:
-                return i
-        raise ValueError(f"Node ID {node_id} not found")
+        try:
+            return self._index[node_id]
+        except KeyError:
+            raise ValueError(f"Node ID {node_id} not found") from None
+    
+    def _get_matrix_indices(self, node_ids):
+        """Convert an array of node IDs to matrix indices (0-based)"""
+        node_ids = np.asarray(node_ids, dtype=np.intp)
+        known = (node_ids >= 0) & (node_ids < len(self._row_of_id))
+        rows = np.where(known, self._row_of_id[np.where(known, node_ids, 0)], -1)
+        if (rows < 0).any():
+            raise ValueError(f"Node ID {node_ids[rows < 0].flat[0]} not found")
+        return rows
     
     def __str__(self):
         return (f"ETSP Instance: {self.n} customers, {self.m} recharging stations\n"
                 f"Battery: {self.Q}, Consumption: {self.h}, Recharge: {self.g}\n"
-                f"Total nodes: {len(self.nodes)}, Matrix shape: {self.distance_matrix.shape}")
+                f"Total nodes: {len(self.ids)}, Matrix shape: {self.distances.shape}")
 
 if __name__ == "__main__":
     instance = ETSPInstance("G/n20w120s5/n20w120s5.1.txt")
@@ -98,4 +788,4 @@ if __name__ == "__main__":
         print(f"  {instance.nodes[i]}")
     
     print(f"\nDistance matrix sample:")
-    print(instance.distance_matrix[:4, :4])
\ No newline at end of file
+    print(instance.distances[:4, :4])
\ No newline at end of file
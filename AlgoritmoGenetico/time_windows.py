@@ -0,0 +1,104 @@
+"""
+Avaliação vetorizada de janelas de tempo para uma população de rotas
+
+Para cada rota o veículo sai do depósito no início da sua janela, viaja com
+tempo igual à distância e, ao chegar cedo num nó, espera a abertura da
+janela (e); chegar depois do fim da janela (l) gera atraso. O início de
+atendimento na posição k é
+
+    s_k = max(s_{k-1} + d_k, e_k)
+
+e, com D_k = d_1 + ... + d_k (distância acumulada), a recorrência vira uma
+soma de prefixos e um máximo acumulado:
+
+    s_k = D_k + max_{j <= k} (e_j - D_j)
+
+calculados com np.cumsum e np.maximum.accumulate sobre o array
+(rotas x posições), sem laço por indivíduo.
+"""
+
+import numpy as np
+
+FEASIBILITY_TOLERANCE = 1e-9
+
+
+def route_rows(instance, tours, closed: bool = False) -> np.ndarray:
+    """
+    Linhas da matriz das rotas, com o depósito nas pontas
+
+    Args:
+        instance: ETSPInstance
+        tours: Array (rotas x posições) de IDs de nós; uma única rota 1D também é aceita
+        closed: Se True, as rotas já começam e terminam no depósito
+    """
+    tours = np.atleast_2d(np.asarray(tours))
+    rows = instance.get_node_rows(tours)
+    if closed:
+        return rows
+    depot = np.zeros((len(rows), 1), dtype=rows.dtype)
+    return np.hstack([depot, rows, depot])
+
+
+def evaluate_time_windows(instance, tours, closed: bool = False) -> dict:
+    """
+    Horários, espera e atraso de cada rota de uma população
+
+    Args:
+        instance: ETSPInstance (usa ready/due e as distâncias da instância)
+        tours: Array (rotas x posições) de IDs de nós, sem o depósito (ou com,
+            se closed=True), como os genes do PyGAD
+        closed: Se True, as rotas já começam e terminam no depósito
+
+    Returns:
+        Dicionário com arrays por rota (as matrizes têm uma coluna por posição
+        da rota, depósito incluído):
+            'arrival': instante de chegada em cada posição
+            'start': início do atendimento (após eventual espera)
+            'waiting': tempo total de espera
+            'lateness': soma dos atrasos (chegada após o fim da janela)
+            'late_visits': número de nós atendidos com atraso
+            'duration': instante de retorno ao depósito
+            'feasible': True se nenhuma janela é violada
+    """
+    rows = route_rows(instance, tours, closed)
+    travel = instance.distances.pairs(rows[:, :-1], rows[:, 1:])
+    return schedule(instance, rows, travel)
+
+
+def schedule(instance, rows: np.ndarray, travel: np.ndarray) -> dict:
+    """
+    Agenda de rotas já convertidas em linhas, com tempos de arco dados
+
+    Args:
+        instance: ETSPInstance (usa ready/due)
+        rows: Array (rotas x posições) de linhas, com o depósito nas pontas
+        travel: Array (rotas x arcos) com o tempo de cada arco; permite incluir
+            desvios e recargas em estações (ver battery.plan_recharges)
+
+    Returns:
+        O mesmo dicionário de evaluate_time_windows
+    """
+    ready = instance.ready[rows]
+    due = instance.due[rows]
+
+    arc_time = np.zeros(rows.shape)
+    arc_time[:, 1:] = travel
+    elapsed = np.cumsum(arc_time, axis=1)
+
+    # s_k = D_k + max_{j <= k}(e_j - D_j); a posição 0 é a saída do depósito
+    start = elapsed + np.maximum.accumulate(ready - elapsed, axis=1)
+    arrival = np.empty_like(start)
+    arrival[:, 0] = start[:, 0]
+    arrival[:, 1:] = start[:, :-1] + arc_time[:, 1:]
+
+    late = np.maximum(start - due, 0.0)
+    lateness = late.sum(axis=1)
+    return {
+        'arrival': arrival,
+        'start': start,
+        'waiting': (start - arrival).sum(axis=1),
+        'lateness': lateness,
+        'late_visits': np.count_nonzero(late > FEASIBILITY_TOLERANCE, axis=1),
+        'duration': start[:, -1],
+        'feasible': lateness <= FEASIBILITY_TOLERANCE
+    }
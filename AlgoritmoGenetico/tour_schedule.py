@@ -0,0 +1,296 @@
+"""
+Agenda de uma rota com folga de tempo (forward time slack, Savelsbergh)
+
+Para cada posição k da rota guarda o início de atendimento mais cedo s_k e a
+folga F_k: o maior atraso que o início em k pode sofrer sem violar nenhuma
+janela de k até o fim da rota,
+
+    F_k = min(l_k - s_k, W_{k+1} + F_{k+1})
+
+onde W é a espera em cada posição (esperas absorvem atrasos). Com esses
+arrays, inserir ou remover um nó só exige calcular o novo início logo após o
+ponto alterado e compará-lo com a folga: O(1) por movimento. Ao aplicar um
+movimento, os inícios são recalculados para frente e as folgas para trás a
+partir do ponto alterado, parando quando os valores deixam de mudar.
+
+Inserção, remoção e troca são verificadas de forma exata; a realocação
+(remoção seguida de inserção) de forma conservadora. Quando o trecho
+seguinte ao movimento já está atrasado, as verificações respondem de forma
+conservadora (inviável), pois a folga só descreve atrasos: a folga de uma
+posição com algum atraso dali até o fim da rota é -inf.
+"""
+
+import numpy as np
+
+from time_windows import schedule, FEASIBILITY_TOLERANCE
+
+
+class TourSchedule:
+    def __init__(self, instance, tour):
+        """
+        Args:
+            instance: ETSPInstance (usa ready/due e as distâncias)
+            tour: Rota fechada de IDs de nós (depósito na primeira e na última posição)
+        """
+        self.instance = instance
+        self.distances = instance.distances
+        self.ready = instance.ready
+        self.due = instance.due
+
+        rows = np.asarray(instance.get_node_rows(tour))
+        travel = np.zeros(len(rows))
+        travel[1:] = self.distances.pairs(rows[:-1], rows[1:])
+        start = schedule(instance, rows[None, :], travel[None, 1:])['start'][0]
+
+        self.rows = rows.tolist()
+        self.travel = travel.tolist()  # travel[k] = d(rota[k-1], rota[k])
+        self.start = start.tolist()
+        self.slack = self._forward_slack(rows, travel, start).tolist()
+        on_time = start <= self.due[rows] + FEASIBILITY_TOLERANCE
+        self.on_time = np.logical_and.accumulate(on_time).tolist()  # prefixo 0..k sem atraso
+
+    def _forward_slack(self, rows: np.ndarray, travel: np.ndarray, start: np.ndarray) -> np.ndarray:
+        """
+        F_k = min_{j >= k}(l_j - s_j + W_{k+1} + ... + W_j), com mínimo de sufixo
+
+        Um nó já atrasado faz a folga de todas as posições até ele ser -inf
+        (as esperas não podem compensar um atraso que já existe).
+        """
+        waiting = np.zeros(len(rows))
+        waiting[1:] = start[1:] - start[:-1] - travel[1:]
+        waited = np.cumsum(waiting)
+        margin = self.due[rows] - start + waited
+        margin[~self._fits(rows, start)] = -np.inf
+        return np.minimum.accumulate(margin[::-1])[::-1] - waited
+
+    @property
+    def tour(self) -> list:
+        """Rota atual (IDs de nós)"""
+        return self.instance.ids[self.rows].tolist()
+
+    @property
+    def length(self) -> float:
+        return float(sum(self.travel))
+
+    @property
+    def feasible(self) -> bool:
+        return self.on_time[-1]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _distance(self, a: int, b: int) -> float:
+        return float(self.distances[a, b])
+
+    def _start_at(self, row: int, arrival: float) -> float:
+        return max(arrival, self.ready[row])
+
+    def _fits(self, row, start):
+        return start <= self.due[row] + FEASIBILITY_TOLERANCE
+
+    def _suffix_absorbs(self, position: int, new_start: float) -> bool:
+        """Se o trecho a partir de position continua viável com o novo início"""
+        push = new_start - self.start[position]
+        return self.slack[position] >= max(push, 0.0) - FEASIBILITY_TOLERANCE
+
+    def _prefix_on_time(self, position: int) -> bool:
+        return position < 0 or self.on_time[position]
+
+    def check_insertion(self, node_id: int, position: int):
+        """
+        Inserção de node_id entre as posições position e position + 1
+
+        Returns:
+            (viável, variação da distância)
+        """
+        row = self.instance.get_node_rows(node_id).item()
+        before, after = self.rows[position], self.rows[position + 1]
+        cost = self._distance(before, row) + self._distance(row, after) - self.travel[position + 1]
+        if not self._prefix_on_time(position):
+            return False, cost
+
+        start = self._start_at(row, self.start[position] + self._distance(before, row))
+        if not self._fits(row, start):
+            return False, cost
+        following = self._start_at(after, start + self._distance(row, after))
+        return self._suffix_absorbs(position + 1, following), cost
+
+    def check_removal(self, position: int):
+        """Remoção do nó da posição position (interna). Returns: (viável, variação da distância)"""
+        before, after = self.rows[position - 1], self.rows[position + 1]
+        shortcut = self._distance(before, after)
+        cost = shortcut - self.travel[position] - self.travel[position + 1]
+        if not self._prefix_on_time(position - 1):
+            return False, cost
+        following = self._start_at(after, self.start[position - 1] + shortcut)
+        return self._suffix_absorbs(position + 1, following), cost
+
+    def check_relocation(self, source: int, target: int):
+        """
+        Move o nó de source para logo depois do nó hoje em target
+
+        A distância é exata; a viabilidade é conservadora: o efeito de um
+        movimento sobre o outro é limitado pelo maior atraso que ele causa
+        (um atraso nunca cresce ao longo da rota).
+
+        Returns:
+            (viável, variação da distância)
+        """
+        if target in (source, source - 1):
+            return self.feasible, 0.0
+        if target == source + 1:
+            # Mover para depois do vizinho seguinte é trocar os dois de posição
+            return self.check_swap(source, target)
+        rows = self.rows
+        row = rows[source]
+        before, after = rows[target], rows[target + 1]
+        shortcut = self._distance(rows[source - 1], rows[source + 1])
+        cost = (shortcut - self.travel[source] - self.travel[source + 1]
+                + self._distance(before, row) + self._distance(row, after)
+                - self.travel[target + 1])
+        if not self._prefix_on_time(min(source, target + 1) - 1):
+            return False, cost
+
+        if target > source:
+            # Remoção primeiro: atrasa o trecho seguinte em no máximo removal_push
+            closed_gap = self._start_at(rows[source + 1], self.start[source - 1] + shortcut)
+            removal_push = max(closed_gap - self.start[source + 1], 0.0)
+            if not self._suffix_absorbs(source + 1, closed_gap):
+                return False, cost
+            start = self._start_at(row, self.start[target] + removal_push + self._distance(before, row))
+            if not self._fits(row, start):
+                return False, cost
+            following = self._start_at(after, start + self._distance(row, after))
+            return self._suffix_absorbs(target + 1, following), cost
+
+        # Inserção primeiro: atrasa o trecho até source - 1 em no máximo insertion_push
+        start = self._start_at(row, self.start[target] + self._distance(before, row))
+        if not self._fits(row, start):
+            return False, cost
+        following = self._start_at(after, start + self._distance(row, after))
+        insertion_push = max(following - self.start[target + 1], 0.0)
+        if not self._suffix_absorbs(target + 1, following):
+            return False, cost
+        closed_gap = self._start_at(rows[source + 1],
+                                    self.start[source - 1] + insertion_push + shortcut)
+        return self._suffix_absorbs(source + 1, closed_gap), cost
+
+    def check_swap(self, i: int, j: int):
+        """
+        Troca dos nós das posições internas i e j
+
+        O trecho entre as posições é reagendado (O(1) para posições vizinhas,
+        O(j - i) em geral) e o restante é verificado pela folga.
+
+        Returns:
+            (viável, variação da distância)
+        """
+        if i > j:
+            i, j = j, i
+        if i == j:
+            return self.feasible, 0.0
+        rows = self.rows
+        middle = rows[i:j + 1]
+        middle[0], middle[-1] = middle[-1], middle[0]
+
+        feasible = self._prefix_on_time(i - 1)
+        time = self.start[i - 1]
+        previous = rows[i - 1]
+        cost = -sum(self.travel[i:j + 2])
+        for row in middle:
+            leg = self._distance(previous, row)
+            cost += leg
+            time = self._start_at(row, time + leg)
+            feasible = feasible and self._fits(row, time)
+            previous = row
+        after = rows[j + 1]
+        leg = self._distance(previous, after)
+        following = self._start_at(after, time + leg)
+        return feasible and self._suffix_absorbs(j + 1, following), cost + leg
+
+    def insert(self, node_id: int, position: int):
+        """Insere node_id entre as posições position e position + 1"""
+        row = self.instance.get_node_rows(node_id).item()
+        k = position + 1
+        self.rows.insert(k, row)
+        self.travel.insert(k, self._distance(self.rows[k - 1], row))
+        self.travel[k + 1] = self._distance(row, self.rows[k + 1])
+        self.start.insert(k, 0.0)
+        self.slack.insert(k, 0.0)
+        self.on_time.insert(k, False)
+        self._refresh(k, k + 1)
+
+    def remove(self, position: int) -> int:
+        """Remove o nó da posição position e retorna seu ID"""
+        row = self.rows.pop(position)
+        for values in (self.travel, self.start, self.slack, self.on_time):
+            del values[position]
+        self.travel[position] = self._distance(self.rows[position - 1], self.rows[position])
+        self._refresh(position, position)
+        return int(self.instance.ids[row])
+
+    def relocate(self, source: int, target: int):
+        """Move o nó de source para logo depois do nó hoje em target"""
+        if target in (source, source - 1):
+            return
+        node_id = self.remove(source)
+        self.insert(node_id, target if target < source else target - 1)
+
+    def swap(self, i: int, j: int):
+        """Troca os nós das posições internas i e j"""
+        if i > j:
+            i, j = j, i
+        if i == j:
+            return
+        self.rows[i], self.rows[j] = self.rows[j], self.rows[i]
+        for k in (i, i + 1, j, j + 1):
+            self.travel[k] = self._distance(self.rows[k - 1], self.rows[k])
+        self._refresh(i, j + 1)
+
+    def _refresh(self, first: int, last: int):
+        """
+        Atualiza os arrays depois de alterações nas posições first..last
+
+        Inícios para frente a partir de first até pararem de mudar; folgas para
+        trás a partir da última posição alterada até pararem de mudar.
+        """
+        rows, start, on_time = self.rows, self.start, self.on_time
+        end = len(rows) - 1
+        k = first
+        while k <= end:
+            row = rows[k]
+            new_start = self._start_at(row, start[k - 1] + self.travel[k]) if k else self.ready[row]
+            new_on_time = self._prefix_on_time(k - 1) and self._fits(row, new_start)
+            if k > last and new_start == start[k] and new_on_time == on_time[k]:
+                break
+            start[k] = new_start
+            on_time[k] = new_on_time
+            k += 1
+        changed = min(k, end)
+
+        slack = self.slack
+        for k in range(changed, -1, -1):
+            row = rows[k]
+            new_slack = self.due[row] - start[k] if self._fits(row, start[k]) else -np.inf
+            if k < end:
+                waiting = start[k + 1] - start[k] - self.travel[k + 1]
+                new_slack = min(new_slack, waiting + slack[k + 1])
+            if k < first - 1 and new_slack == slack[k]:
+                break
+            slack[k] = new_slack
+
+
+
+if __name__ == "__main__":
+    from instance_reader import ETSPInstance, NODE_CUSTOMER
+
+    instance = ETSPInstance("G/n20w120s10/n20w120s10.1.txt")
+    customers = instance.ids[instance.kind == NODE_CUSTOMER].tolist()
+    # Clientes na ordem dos fins de janela
+    tour_schedule = TourSchedule(instance, [0] + sorted(customers, key=lambda c: instance.due[c]) + [0])
+
+    print(f"Rota: {tour_schedule.tour}")
+    print(f"Distância: {tour_schedule.length:.2f}, viável: {tour_schedule.feasible}")
+    print(f"Folga no depósito: {tour_schedule.slack[0]:.2f}")
+    print(f"Trocar as posições 1 e 2: {tour_schedule.check_swap(1, 2)}")
+    print(f"Remover a posição 1: {tour_schedule.check_removal(1)}")
@@ -3,12 +3,21 @@ import matplotlib.pyplot as plt
 import random
 import pygad
 from typing import List, Dict
-from instance_reader import ETSPInstance
+from instance_reader import ETSPInstance, INSTANCE_EXTENSIONS
+from fitness_cache import TourCache
+from tour_ops import (MUTATION_TYPES, CROSSOVER_TYPES, mutation_delta, apply_mutation,
+                      apply_crossover, random_cuts)
+from time_windows import evaluate_time_windows
+from battery import evaluate_battery, plan_recharges
+from arc_filter import move_adds_infeasible_arc, random_feasible_tours
+from eax import EAXCrossover
 import os
 import time
 
 class TSPGeneticAlgorithm:
-    def __init__(self, instance: ETSPInstance, population_size=50, mutation_rate=0.1, crossover_rate=0.8, generations=100):
+    def __init__(self, instance: ETSPInstance, population_size=50, mutation_rate=0.1, crossover_rate=0.8, generations=100,
+                 fitness_batch_size=None, cache_size=None, mutation_type="swap", arc_pruning=False,
+                 crossover_type="order", report_etsptw=False):
         """
         Algoritmo Genético para Problema do Caixeiro Viajante usando PyGAD
         
@@ -18,30 +27,57 @@ class TSPGeneticAlgorithm:
             mutation_rate: Taxa de mutação
             crossover_rate: Taxa de crossover
             generations: Número de gerações
+            fitness_batch_size: Soluções avaliadas por chamada da fitness (PyGAD
+                fitness_batch_size). None avalia a população inteira de uma vez;
+                1 usa a fitness por solução
+            cache_size: Se informado, guarda as distâncias das últimas cache_size
+                rotas distintas (LRU) e evita reavaliá-las
+            mutation_type: "swap" ou "inversion"; com o cache habilitado, a
+                distância do mutante é obtida pela variação das arestas alteradas
+            arc_pruning: Se True, consulta a máscara de arcos viáveis pelas janelas
+                de tempo (ETSPInstance.arc_mask): a população inicial é construída
+                por arcos permitidos e mutações que criam arcos proibidos são descartadas
+            crossover_type: "order" (OX), "pmx", "cycle" (CX) ou "eax" (montagem de
+                arestas, ver eax.py); os filhos já são permutações válidas, sem o
+                reparo de genes duplicados do PyGAD
+            report_etsptw: Se True, o resultado inclui as janelas de tempo, a
+                bateria e o plano de recarga da melhor rota; bateria e plano são
+                omitidos em instâncias sem estações ou sem limite de carga
         """
+        if mutation_type not in MUTATION_TYPES:
+            raise ValueError(f"Unknown mutation type: {mutation_type!r} (expected one of {MUTATION_TYPES})")
+        if crossover_type not in CROSSOVER_TYPES + ('eax',):
+            raise ValueError(f"Unknown crossover type: {crossover_type!r} "
+                             f"(expected one of {CROSSOVER_TYPES + ('eax',)})")
         self.instance = instance
         self.population_size = population_size
         self.mutation_rate = mutation_rate
         self.crossover_rate = crossover_rate
         self.generations = generations
+        self.fitness_batch_size = fitness_batch_size or population_size
+        self.mutation_type = mutation_type
+        self.crossover_type = crossover_type
+        self.report_etsptw = report_etsptw
         
         self.valid_nodes = [0] + list(range(1, instance.n + 1))
         self.num_nodes = len(self.valid_nodes)
         
         self.distance_matrix = self._build_reduced_distance_matrix()
+        self.symmetric = instance.is_symmetric()
+        self.cache = TourCache(cache_size, self.symmetric) if cache_size else None
+        self.arc_mask = instance.arc_mask() if arc_pruning else None
         
         self.best_fitness_history = []
         self.avg_fitness_history = []
         
         self.ga_instance = None
+        self.rng = None
+        self.eax = None
         
     def _build_reduced_distance_matrix(self) -> np.ndarray:
         """Constrói matriz de distâncias apenas para depósito e clientes"""
-        matrix = np.zeros((self.num_nodes, self.num_nodes))
-        for i, node_i in enumerate(self.valid_nodes):
-            for j, node_j in enumerate(self.valid_nodes):
-                matrix[i][j] = self.instance.get_distance(node_i, node_j)
-        return matrix
+        # Depósito e clientes ocupam as linhas 0..n da matriz: retorna uma view, sem cópia
+        return self.instance.submatrix(self.valid_nodes)
     
     def _get_node_index(self, node_id: int) -> int:
         """Retorna o índice na matriz reduzida para um ID de nó"""
@@ -52,20 +88,119 @@ class TSPGeneticAlgorithm:
         Função de fitness para PyGAD
         PyGAD usa permutação dos índices dos clientes (sem depósito)
         """
-        route = [0] + [self.valid_nodes[int(gene)] for gene in solution] + [0]
+        solution = np.asarray(solution)
+        if self.cache is not None:
+            return -self.cache.lookup(solution, lambda tour: self.tour_lengths(tour[None, :])[0])
+        return -self.tour_lengths(solution[None, :])[0]
+    
+    def fitness_function_batch(self, ga_instance, solutions, solutions_indices):
+        """Função de fitness em lote para PyGAD (fitness_batch_size > 1)"""
+        if self.cache is not None:
+            return -self.cache.lookup_batch(np.asarray(solutions), self.tour_lengths)
+        return -self.tour_lengths(solutions)
+    
+    def tour_lengths(self, solutions: np.ndarray) -> np.ndarray:
+        """
+        Distância total de cada solução de um array (soluções x genes)
+        
+        Os genes são índices de valid_nodes, que coincidem com as linhas da
+        matriz reduzida; o depósito (índice 0) é acrescentado nas pontas e todas
+        as arestas são lidas com um único gather na matriz.
+        """
+        solutions = np.asarray(solutions, dtype=np.intp)
+        depot = np.zeros((len(solutions), 1), dtype=np.intp)
+        routes = np.hstack([depot, solutions, depot])
+        return self.distance_matrix[routes[:, :-1], routes[:, 1:]].sum(axis=1, dtype=np.float64)
+    
+    def crossover_function(self, parents: np.ndarray, offspring_size: tuple, ga_instance) -> np.ndarray:
+        """
+        Cruzamento para PyGAD: OX, PMX ou CX sobre o array de pais, todos os pares de uma vez
         
-        total_distance = 0
-        for i in range(len(route) - 1):
-            from_idx = self._get_node_index(route[i])
-            to_idx = self._get_node_index(route[i + 1])
-            total_distance += self.distance_matrix[from_idx][to_idx]
+        Como no cruzamento do PyGAD, o filho k vem dos pais k e k + 1 (circular);
+        com probabilidade 1 - crossover_rate o filho é uma cópia do primeiro pai,
+        e só os demais pares são cruzados. O EAX é aplicado par a par e já
+        informa a distância de cada filho, que vai para o cache quando habilitado.
+        """
+        count, num_genes = offspring_size
+        first = np.arange(count) % len(parents)
+        parents1 = parents[first]
+        parents2 = parents[(first + 1) % len(parents)]
+        offspring = parents1.copy()
+        crossed = self.rng.random(count) < self.crossover_rate
+        if num_genes < 2 or not crossed.any():
+            return offspring
+        
+        if self.eax is not None:
+            children, lengths = self.eax.cross_pairs(parents1[crossed], parents2[crossed])
+            if self.cache is not None:
+                for child, length in zip(children, lengths.tolist()):
+                    self.cache.put(child, length)
+        else:
+            start, end = random_cuts(self.rng, int(crossed.sum()), num_genes)
+            children = apply_crossover(self.crossover_type, parents1[crossed], parents2[crossed], start, end)
+        offspring[crossed] = children
+        return offspring
+    
+    def random_population(self) -> np.ndarray:
+        """População inicial de permutações dos clientes (uma por linha)"""
+        if self.arc_mask is not None:
+            # Genes são índices de valid_nodes, iguais aos IDs de depósito/clientes
+            return random_feasible_tours(self.instance, self.population_size, np.random.randint(2**32))
+        customers = np.arange(1, self.num_nodes)
+        return np.array([np.random.permutation(customers) for _ in range(self.population_size)])
+    
+    def mutation_function(self, offspring: np.ndarray, ga_instance) -> np.ndarray:
+        """
+        Mutação para PyGAD: um movimento (troca ou inversão) por filho
         
-        return -total_distance
+        Quando a distância do filho já está no cache, a do mutante é calculada
+        em O(1) pela variação das arestas alteradas e guardada no cache, e a
+        fitness não precisa reavaliar a rota.
+        """
+        num_genes = offspring.shape[1]
+        if num_genes < 2:
+            return offspring
+        
+        for solution in offspring:
+            i, j = np.random.choice(num_genes, size=2, replace=False)
+            # Posições i, j dos genes são i + 1, j + 1 na rota com depósito nas pontas
+            if self.arc_mask is not None and move_adds_infeasible_arc(
+                    self.arc_mask, np.concatenate(([0], solution, [0])), i + 1, j + 1, self.mutation_type):
+                continue  # movimento descartado: criaria um arco proibido
+            base = self.cache.peek(solution) if self.cache is not None else None
+            if base is not None:
+                route = np.concatenate(([0], solution, [0]))
+                delta = mutation_delta(self.mutation_type, self.distance_matrix, route,
+                                       i + 1, j + 1, self.symmetric)
+            apply_mutation(self.mutation_type, solution, i, j)
+            if base is not None:
+                self.cache.put(solution, base + delta)
+        return offspring
+    
+    def evaluate_time_windows(self, solutions: np.ndarray) -> Dict:
+        """Chegadas, espera, atraso e viabilidade das janelas de tempo de um array de soluções"""
+        nodes = np.asarray(self.valid_nodes)[np.asarray(solutions, dtype=np.intp)]
+        return evaluate_time_windows(self.instance, nodes)
+    
+    def evaluate_battery(self, solutions: np.ndarray) -> Dict:
+        """Estado de carga, recargas necessárias e viabilidade da bateria de um array de soluções"""
+        nodes = np.asarray(self.valid_nodes)[np.asarray(solutions, dtype=np.intp)]
+        return evaluate_battery(self.instance, nodes)
+    
+    def plan_recharges(self, solutions: np.ndarray) -> Dict:
+        """Paradas de recarga de menor desvio e agenda resultante de um array de soluções"""
+        nodes = np.asarray(self.valid_nodes)[np.asarray(solutions, dtype=np.intp)]
+        return plan_recharges(self.instance, nodes)
+    
+    def _reports_battery(self) -> bool:
+        """Se o relatório inclui a bateria (habilitado, com estações e carga limitada)"""
+        return self.report_etsptw and self.instance.m > 0 and np.isfinite(self.instance.Q)
     
     def on_generation(self, ga_instance):
         """Callback chamado a cada geração"""
         generation = ga_instance.generations_completed
-        fitness = ga_instance.best_solution()[1]
+        # Reaproveita a fitness já calculada em vez de reavaliar a população
+        fitness = ga_instance.best_solution(pop_fitness=ga_instance.last_generation_fitness)[1]
         
         self.best_fitness_history.append(fitness)
         
@@ -80,12 +215,8 @@ class TSPGeneticAlgorithm:
     
     def calculate_distance(self, route: List[int]) -> float:
         """Calcula distância total de uma rota"""
-        total_distance = 0
-        for i in range(len(route) - 1):
-            from_idx = self._get_node_index(route[i])
-            to_idx = self._get_node_index(route[i + 1])
-            total_distance += self.distance_matrix[from_idx][to_idx]
-        return total_distance
+        indices = [self._get_node_index(node) for node in route]
+        return self.distance_matrix[indices[:-1], indices[1:]].sum(dtype=np.float64)
     
     def run(self) -> Dict:
         if hasattr(self, 'verbose') and self.verbose:
@@ -94,28 +225,36 @@ class TSPGeneticAlgorithm:
         num_genes = len(self.valid_nodes) - 1
         
         gene_space = list(range(1, num_genes + 1))
+        # Gerador dos cruzamentos, semeado pelo np.random global (como as mutações)
+        self.rng = np.random.default_rng(np.random.randint(2**32))
+        if self.crossover_type == 'eax':
+            self.eax = EAXCrossover(self.distance_matrix, self.symmetric, rng=self.rng)
         
         self.ga_instance = pygad.GA(
             num_generations=self.generations,
             num_parents_mating=int(self.population_size * 0.5),
-            fitness_func=self.fitness_function,
+            fitness_func=self.fitness_function if self.fitness_batch_size == 1 else self.fitness_function_batch,
+            fitness_batch_size=self.fitness_batch_size,
             sol_per_pop=self.population_size,
+            initial_population=self.random_population(),
             num_genes=num_genes,
             gene_space=gene_space,
             parent_selection_type="tournament",
             K_tournament=3,
-            crossover_type="single_point",
-            mutation_type="swap",
+            crossover_type=self.crossover_function,
+            mutation_type=self.mutation_function,
             mutation_probability=self.mutation_rate,
             on_generation=self.on_generation,
             gene_type=int,
-            allow_duplicate_genes=False,
+            # Cruzamento e mutação preservam as permutações: sem reparo de duplicados
+            allow_duplicate_genes=True,
             stop_criteria=["saturate_10"]
         )
         
         self.ga_instance.run()
         
-        solution, solution_fitness, solution_idx = self.ga_instance.best_solution()
+        solution, solution_fitness, solution_idx = self.ga_instance.best_solution(
+            pop_fitness=self.ga_instance.last_generation_fitness)
         
         best_route = [0] + [self.valid_nodes[int(gene)] for gene in solution] + [0]
         best_distance = -solution_fitness
@@ -128,6 +267,22 @@ class TSPGeneticAlgorithm:
             'avg_fitness_history': self.avg_fitness_history,
             'generations_completed': self.ga_instance.generations_completed
         }
+        if self.report_etsptw:
+            windows = self.evaluate_time_windows(solution)
+            results['time_windows'] = {key: windows[key][0].item()
+                                       for key in ('waiting', 'lateness', 'late_visits', 'feasible')}
+        if self._reports_battery():
+            battery = self.evaluate_battery(solution)
+            results['battery'] = {key: battery[key][0].item()
+                                  for key in ('violations', 'detour', 'recharge_time', 'feasible')}
+            plan = self.plan_recharges(solution)
+            results['recharge_plan'] = {
+                'stations': [int(station) for station in plan['stations'][0] if station >= 0],
+                **{key: plan[key][0].item() for key in ('detour', 'recharge_time', 'duration',
+                                                        'lateness', 'battery_feasible', 'feasible')}
+            }
+        if self.cache is not None:
+            results['cache_stats'] = self.cache.stats()
         
         return results
     
@@ -147,13 +302,10 @@ class TSPGeneticAlgorithm:
         
         # Plot da melhor rota
         best_route = results['best_route']
-        coordinates = []
-        for node_id in best_route:
-            node_info = self.instance.get_node_info(node_id)
-            coordinates.append((node_info['x'], node_info['y']))
-        
-        x_coords = [coord[0] for coord in coordinates]
-        y_coords = [coord[1] for coord in coordinates]
+        rows = self.instance.get_node_rows(best_route)
+        x_coords = self.instance.x[rows]
+        y_coords = self.instance.y[rows]
+        coordinates = list(zip(x_coords, y_coords))
         
         ax2.plot(x_coords, y_coords, 'o-', markersize=8, linewidth=2)
         ax2.scatter(x_coords, y_coords, s=100, c='red', zorder=5)
@@ -179,14 +331,29 @@ class TSPGeneticAlgorithm:
         print(f"Melhor rota encontrada: {results['best_route']}")
         print(f"Distância total: {results['best_distance']:.2f}")
         print(f"Fitness da melhor solução: {results['best_fitness']:.2f}")
+        if 'time_windows' in results:
+            windows = results['time_windows']
+            print(f"Janelas de tempo: {'respeitadas' if windows['feasible'] else 'violadas'} "
+                  f"(atraso total = {windows['lateness']:.2f}, clientes atrasados = {windows['late_visits']}, "
+                  f"espera = {windows['waiting']:.2f})")
+        if 'battery' in results:
+            battery = results['battery']
+            print(f"Bateria: {'viável' if battery['feasible'] else 'inviável'} "
+                  f"(recargas = {battery['violations']}, desvio = {battery['detour']:.2f}, "
+                  f"tempo de recarga = {battery['recharge_time']:.2f})")
+        if 'recharge_plan' in results:
+            plan = results['recharge_plan']
+            print(f"Plano de recarga (PD): estações {plan['stations']}, desvio = {plan['detour']:.2f}, "
+                  f"tempo de recarga = {plan['recharge_time']:.2f}, duração = {plan['duration']:.2f}, "
+                  f"{'viável' if plan['feasible'] else 'inviável'}")
         print(f"Gerações completadas: {results['generations_completed']}")
         print(f"Número de clientes: {self.instance.n}")
         print(f"Tamanho da população: {self.population_size}")
         print(f"Taxa de mutação: {self.mutation_rate}")
         print("Operadores utilizados:")
         print("  - Seleção: Tournament (K=3)")
-        print("  - Crossover: Single Point")
-        print("  - Mutação: Swap Mutation")
+        print(f"  - Crossover: {self.crossover_type}")
+        print(f"  - Mutação: {self.mutation_type}")
         print("  - Critério de parada: Estagnação por 10 gerações")
 
 def run_multiple_instances():
@@ -231,7 +398,7 @@ def run_multiple_instances():
         print(f"Testando instâncias do diretório: {instance_dir}")
         print("-" * 60)
         
-        instance_files = [f for f in os.listdir(instance_dir) if f.endswith('.txt')]
+        instance_files = [f for f in os.listdir(instance_dir) if f.endswith(INSTANCE_EXTENSIONS)]
         instance_files.sort()
         
         dir_results = []
@@ -380,7 +547,8 @@ def run_single_instance(instance_path: str, verbose: bool = True):
             population_size=50,
             mutation_rate=0.1,
             crossover_rate=0.85,
-            generations=100
+            generations=100,
+            report_etsptw=True
         )
         
         ga.verbose = verbose
@@ -405,11 +573,11 @@ def run_directory_instances(directory_path: str):
         print(f"Diretório não encontrado: {directory_path}")
         return
     
-    # Lista todos os arquivos .txt no diretório
-    instance_files = [f for f in os.listdir(directory_path) if f.endswith('.txt')]
+    # Lista todos os arquivos de instância (G/Dumas .txt, TSPLIB .tsp) no diretório
+    instance_files = [f for f in os.listdir(directory_path) if f.endswith(INSTANCE_EXTENSIONS)]
     
     if not instance_files:
-        print(f"Nenhum arquivo .txt encontrado em: {directory_path}")
+        print(f"Nenhum arquivo .txt/.tsp encontrado em: {directory_path}")
         return
     
     instance_files.sort()
@@ -498,7 +666,7 @@ def print_help():
     print("="*70)
     print("Uso:")
     print("  python tsp_ag.py                           # Executa todas as instâncias")
-    print("  python tsp_ag.py <arquivo.txt>             # Executa uma instância específica")
+    print("  python tsp_ag.py <arquivo.txt|.tsp>        # Executa uma instância específica")
     print("  python tsp_ag.py <diretório>               # Executa todas as instâncias de um diretório")
     print("  python tsp_ag.py --help                    # Mostra esta ajuda")
     print()
@@ -507,6 +675,9 @@ def print_help():
     print("  python tsp_ag.py G/n20w120s5                    # Todas as instâncias do diretório")
     print("  python tsp_ag.py G/n20w140s10/n20w140s10.3.txt  # Outra instância específica")
     print()
+    print("Formatos aceitos: G (n, m, Q, h, g + nós + matriz), TSPLIB (EUC_2D/EXPLICIT)")
+    print("e Dumas (TSPTW, original ou em matriz), detectados automaticamente.")
+    print()
     print("Diretórios disponíveis:")
     import os
     for dir_name in sorted(os.listdir('G') if os.path.exists('G') else []):
@@ -0,0 +1,95 @@
+"""
+Uso da máscara de arcos viáveis (ETSPInstance.arc_mask) pelos operadores
+
+Um arco i -> j fora da máscara não aparece em nenhuma rota que respeite as
+janelas de tempo. Os operadores consultam a máscara para não gastar
+avaliações em rotas com arcos proibidos:
+
+    - infeasible_arc_counts: número de arcos proibidos de cada rota (vetorizado)
+    - move_adds_infeasible_arc: se uma troca/inversão cria um arco proibido
+      (só olha os arcos alterados)
+    - random_feasible_tours: rotas iniciais construídas andando só por arcos
+      permitidos, preferindo clientes de janela mais cedo
+
+As rotas são fechadas (depósito nas pontas) e indexadas pelas linhas da
+máscara, que coincidem com os IDs de depósito/clientes.
+"""
+
+import numpy as np
+
+SEED_CANDIDATES = 3  # próximos clientes sorteados entre os de janela mais cedo
+
+
+def infeasible_arc_counts(mask: np.ndarray, routes) -> np.ndarray:
+    """Número de arcos fora da máscara em cada rota de um array (rotas x posições)"""
+    routes = np.atleast_2d(np.asarray(routes, dtype=np.intp))
+    return np.count_nonzero(~mask[routes[:, :-1], routes[:, 1:]], axis=1)
+
+
+def move_adds_infeasible_arc(mask: np.ndarray, route, i: int, j: int, mutation_type: str) -> bool:
+    """
+    Se o movimento ('swap' ou 'inversion') nas posições internas i, j cria algum
+    arco fora da máscara (só os arcos novos são consultados)
+    """
+    if i == j:
+        return False
+    if i > j:
+        i, j = j, i
+    if mutation_type == 'swap':
+        a, b = route[i], route[j]
+        if j == i + 1:
+            new_arcs = ((route[i - 1], b), (b, a), (a, route[j + 1]))
+        else:
+            new_arcs = ((route[i - 1], b), (b, route[i + 1]), (route[j - 1], a), (a, route[j + 1]))
+        return not all(mask[x, y] for x, y in new_arcs)
+
+    # Inversão: arcos das pontas e os internos, agora no sentido contrário
+    if not (mask[route[i - 1], route[j]] and mask[route[i], route[j + 1]]):
+        return True
+    segment = np.asarray(route[i:j + 1], dtype=np.intp)
+    return not mask[segment[1:], segment[:-1]].all()
+
+
+def random_feasible_tours(instance, count: int, rng=None) -> np.ndarray:
+    """
+    Rotas aleatórias (sem o depósito nas pontas) que só usam arcos permitidos
+    sempre que possível
+
+    A partir do depósito, o próximo cliente é sorteado entre os
+    SEED_CANDIDATES não visitados de menor fim de janela (janelas apertadas)
+    alcançáveis por um arco permitido; sem nenhum alcançável, segue para o não
+    visitado de menor fim de janela (janelas sem fim, l = inf, ficam por
+    último). Todas as rotas avançam juntas, um passo por vez.
+
+    Returns:
+        Array (count x n) de IDs de clientes
+    """
+    rng = np.random.default_rng(rng)
+    mask = instance.arc_mask()
+    _, due = instance.tightened_windows()
+    n = instance.n
+    tours = np.empty((count, n), dtype=np.intp)
+    visited = np.zeros((count, n + 1), dtype=bool)
+    visited[:, 0] = True
+    current = np.zeros(count, dtype=np.intp)
+    everyone = np.arange(count)
+    # Posição de cada nó na ordem dos fins de janela (finita mesmo com l = inf)
+    urgency = np.empty(n + 1, dtype=np.intp)
+    urgency[np.argsort(due, kind='stable')] = np.arange(n + 1)
+
+    for step in range(n):
+        reachable = mask[current] & ~visited
+        # Alcançáveis primeiro, pelo fim da janela; visitados nunca são escolhidos
+        priority = np.where(reachable, urgency, urgency + (n + 1))
+        priority[visited] = 2 * (n + 1)
+        order = np.argsort(priority, axis=1, kind='stable')
+        options = np.minimum(np.count_nonzero(reachable, axis=1), SEED_CANDIDATES)
+        pick = np.where(options > 0, (rng.random(count) * np.maximum(options, 1)).astype(np.intp), 0)
+        chosen = order[everyone, pick]
+        tours[:, step] = chosen
+        visited[everyone, chosen] = True
+        current = chosen
+
+    if not np.array_equal(np.sort(tours, axis=1), np.broadcast_to(np.arange(1, n + 1), tours.shape)):
+        raise RuntimeError("random_feasible_tours produced a row that is not a permutation of the customers")
+    return tours
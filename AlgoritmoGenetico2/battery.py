@@ -0,0 +1,263 @@
+"""
+Avaliação de bateria (estado de carga) para uma população de rotas
+
+O veículo sai do depósito com a bateria cheia (Q) e cada arco (i, j) consome
+h * d(i, j). Quando a carga não basta para um arco, a estação de recarga de
+menor desvio d(i, s) + d(s, j) - d(i, j) é inserida nele: o veículo recarrega
+até Q e o tempo de recarga é g * (energia recarregada). Se a estação não é
+alcançável com a carga atual (ou não há estações), a rota fica sem solução
+para a bateria ("stranded").
+
+O laço percorre as posições da rota, vetorizado sobre a população; a melhor
+estação de cada arco vem da tabela ETSPInstance.station_table() (calculada
+uma vez por instância), então cada rota custa O(n).
+
+plan_recharges escolhe as estações por programação dinâmica em vez da regra
+gulosa, com recarga "só o necessário" em cada parada (ver a função).
+"""
+
+import numpy as np
+
+from time_windows import route_rows, schedule
+
+
+def evaluate_battery(instance, tours, closed: bool = False) -> dict:
+    """
+    Estado de carga, violações e recargas de cada rota de uma população
+
+    Args:
+        instance: ETSPInstance (usa Q, h, g e as estações de recarga)
+        tours: Array (rotas x posições) de IDs de depósito/clientes, sem o
+            depósito nas pontas (ou com, se closed=True)
+        closed: Se True, as rotas já começam e terminam no depósito
+
+    Returns:
+        Dicionário com arrays por rota:
+            'soc': carga na chegada a cada posição (com as recargas inseridas)
+            'stations': estação inserida antes de cada posição 1.. (-1 se nenhuma)
+            'violations': número de arcos que precisaram de recarga
+            'detour': distância extra das estações inseridas
+            'recharge_time': tempo total de recarga (g * energia)
+            'feasible': True se todas as violações foram resolvidas por uma estação
+    """
+    rows = route_rows(instance, tours, closed)
+    station, detour, _ = instance.station_table()
+    capacity, rate, recharge_rate = float(instance.Q), float(instance.h), float(instance.g)
+    distances = instance.distances
+
+    count, length = rows.shape
+    consumption = rate * distances.pairs(rows[:, :-1], rows[:, 1:]).astype(np.float64)
+    soc = np.empty((count, length))
+    soc[:, 0] = capacity
+    inserted = np.full((count, length - 1), -1, dtype=np.intp)
+    violations = np.zeros(count, dtype=np.int64)
+    extra = np.zeros(count)
+    recharge_time = np.zeros(count)
+    stranded = np.zeros(count, dtype=bool)
+
+    level = np.full(count, capacity)
+    for k in range(length - 1):
+        level = level - consumption[:, k]
+        short = np.flatnonzero(level < 0)
+        if len(short):
+            origin, target = rows[short, k], rows[short, k + 1]
+            best = station[origin, target]
+            has_station = best >= 0
+            to_station = np.full(len(short), np.inf)
+            from_station = np.full(len(short), np.inf)
+            to_station[has_station] = rate * distances.pairs(origin[has_station], best[has_station])
+            from_station[has_station] = rate * distances.pairs(best[has_station], target[has_station])
+
+            # Carga ao sair de i (antes do arco) e chegada à estação; a tabela
+            # só indica estações das quais se chega a j com a bateria cheia
+            at_station = level[short] + consumption[short, k] - to_station
+            reachable = at_station >= 0
+            served = short[reachable]
+
+            violations[short] += 1
+            stranded[short[~reachable]] = True
+            inserted[served, k] = best[reachable]
+            extra[served] += detour[origin[reachable], target[reachable]]
+            recharge_time[served] += recharge_rate * (capacity - at_station[reachable])
+            level[served] = capacity - from_station[reachable]
+        soc[:, k + 1] = level
+
+    return {
+        'soc': soc,
+        'stations': inserted,
+        'violations': violations,
+        'detour': extra,
+        'recharge_time': recharge_time,
+        'feasible': ~stranded
+    }
+
+
+def _fenwick_update(values, entries, position, value, entry):
+    """Atualiza as árvores de Fenwick (mínimo de prefixo) de várias rotas de uma vez"""
+    size = values.shape[1] - 1
+    position = position.copy()
+    active = np.flatnonzero(np.isfinite(value))
+    while len(active):
+        slot = position[active]
+        better = value[active] < values[active, slot]
+        values[active[better], slot[better]] = value[active[better]]
+        entries[active[better], slot[better]] = entry[active[better]]
+        position[active] = slot + (slot & -slot)
+        active = active[position[active] <= size]
+
+
+def _fenwick_query(values, entries, position):
+    """Mínimo (e entrada correspondente) das posições 1..position de cada rota"""
+    best = np.full(len(position), np.inf)
+    argbest = np.full(len(position), -1, dtype=np.intp)
+    position = position.copy()
+    active = np.flatnonzero(position > 0)
+    while len(active):
+        slot = position[active]
+        candidate = values[active, slot]
+        better = candidate < best[active]
+        best[active[better]] = candidate[better]
+        argbest[active[better]] = entries[active[better], slot[better]]
+        position[active] = slot - (slot & -slot)
+        active = active[position[active] > 0]
+    return best, argbest
+
+
+def plan_recharges(instance, tours, closed: bool = False) -> dict:
+    """
+    Paradas de recarga de menor custo para a ordem de clientes de cada rota
+
+    Cada arco (i, j) pode receber uma parada na sua melhor estação (tabela
+    ETSPInstance.station_table()). Recarregando em cada parada só a energia
+    necessária para chegar à próxima, a energia total recarregada é a da
+    rota com os desvios menos Q, então o tempo total é mínimo quando o
+    desvio total é mínimo, sujeito a que cada trecho entre duas paradas
+    (ou depósito) caiba em Q:
+
+        f[b] = desvio[b] + min { f[a] : a < b, saída[a] - E[a+1] <= Q - E[b] - entrada[b] }
+
+    com E a energia acumulada da rota, entrada[b] = h * d(i, s) e
+    saída[a] = h * d(s, j). O mínimo com a restrição é uma consulta de prefixo
+    numa árvore de Fenwick indexada pela ordem de saída[a] - E[a+1], então
+    cada rota custa O(n log n); o laço é sobre os arcos, vetorizado sobre a
+    população. As janelas de tempo não entram na escolha das paradas: são
+    verificadas na agenda resultante (com desvios e tempos de recarga).
+
+    Args:
+        instance: ETSPInstance
+        tours: Array (rotas x posições) de IDs de depósito/clientes, sem o
+            depósito nas pontas (ou com, se closed=True)
+        closed: Se True, as rotas já começam e terminam no depósito
+
+    Returns:
+        Dicionário com arrays por rota:
+            'stations': estação visitada em cada arco (-1 se nenhuma)
+            'charge': energia recarregada em cada arco
+            'detour': distância extra das paradas
+            'recharge_time': tempo total de recarga (g * energia)
+            'battery_feasible': True se existe um plano de recarga para a rota
+            'arrival', 'start', 'waiting', 'lateness', 'late_visits',
+            'duration': agenda com as paradas (ver time_windows.schedule)
+            'time_feasible': True se a agenda respeita as janelas
+            'feasible': battery_feasible e time_feasible
+    """
+    rows = route_rows(instance, tours, closed)
+    count, length = rows.shape
+    arcs = length - 1
+    capacity, rate, recharge_rate = float(instance.Q), float(instance.h), float(instance.g)
+    distances = instance.distances
+    station_of, detour_of, _ = instance.station_table()
+
+    distance = distances.pairs(rows[:, :-1], rows[:, 1:]).astype(np.float64)
+    energy = np.zeros((count, length))
+    energy[:, 1:] = np.cumsum(rate * distance, axis=1)
+
+    chosen = np.zeros((count, arcs), dtype=bool)
+    feasible = np.ones(count, dtype=bool)
+    best = station_of[rows[:, :-1], rows[:, 1:]]
+    into = np.full((count, arcs), np.inf)
+    out = np.full((count, arcs), np.inf)
+    has_station = best >= 0
+    into[has_station] = rate * distances.pairs(rows[:, :-1][has_station], best[has_station])
+    out[has_station] = rate * distances.pairs(best[has_station], rows[:, 1:][has_station])
+
+    if np.isfinite(capacity) and (energy[:, -1] > capacity).any():
+        # Entradas: 0 = saída do depósito, a + 1 = parada no arco a
+        keys = np.empty((count, arcs + 1))
+        keys[:, 0] = 0.0
+        keys[:, 1:] = out - energy[:, 1:]
+        limits = np.empty((count, arcs + 1))
+        limits[:, :arcs] = capacity - energy[:, :-1] - into
+        limits[:, arcs] = capacity - energy[:, -1]  # chegada ao depósito
+
+        # Posição de cada entrada na ordem das chaves e quantas chaves <= cada limite
+        size = arcs + 1
+        index = np.arange(count)[:, None]
+        rank = np.empty((count, size), dtype=np.intp)
+        rank[index, np.argsort(keys, axis=1, kind='stable')] = np.arange(1, size + 1)
+        merged = np.argsort(np.hstack([keys, limits]), axis=1, kind='stable')
+        keys_before = np.cumsum(merged < size, axis=1)
+        counts = np.empty((count, 2 * size), dtype=np.intp)
+        counts[index, merged] = keys_before
+        allowed = counts[:, size:]
+
+        values = np.full((count, size + 1), np.inf)
+        entries = np.full((count, size + 1), -1, dtype=np.intp)
+        previous = np.full((count, size), -1, dtype=np.intp)
+        _fenwick_update(values, entries, rank[:, 0], np.zeros(count), np.zeros(count, dtype=np.intp))
+        detour = np.where(has_station, detour_of[rows[:, :-1], rows[:, 1:]], np.inf)
+        for b in range(arcs):
+            cost, previous[:, b + 1] = _fenwick_query(values, entries, allowed[:, b])
+            _fenwick_update(values, entries, rank[:, b + 1], cost + detour[:, b],
+                            np.full(count, b + 1, dtype=np.intp))
+        total, current = _fenwick_query(values, entries, allowed[:, arcs])
+        feasible = np.isfinite(total)
+
+        # Reconstrói as paradas a partir da chegada ao depósito
+        current = np.where(feasible, current, 0)
+        active = np.flatnonzero(current > 0)
+        while len(active):
+            chosen[active, current[active] - 1] = True
+            current[active] = previous[active, current[active]]
+            active = active[current[active] > 0]
+
+    charge = np.zeros((count, arcs))
+    if np.isfinite(capacity):  # sem bateria (Q = inf) não há paradas nem recarga
+        # Próximo ponto de recarga depois de cada arco (arcs = depósito final)
+        following = np.empty((count, arcs), dtype=np.intp)
+        upcoming = np.full(count, arcs, dtype=np.intp)
+        for k in range(arcs - 1, -1, -1):
+            following[:, k] = upcoming
+            upcoming = np.where(chosen[:, k], k, upcoming)
+        index = np.arange(count)[:, None]
+        into_next = np.where(following < arcs, into[index, np.minimum(following, arcs - 1)], 0.0)
+        needed = out + energy[index, following] - energy[:, 1:] + into_next
+
+        # Recarga "só o necessário": o suficiente para chegar ao próximo ponto de recarga
+        level = np.full(count, capacity)
+        for k in range(arcs):
+            stop = chosen[:, k]
+            at_station = level - into[:, k]
+            charge[stop, k] = np.maximum(needed[stop, k] - at_station[stop], 0.0)
+            level = np.where(stop, at_station + charge[:, k] - out[:, k], level - rate * distance[:, k])
+
+    stations = np.where(chosen, best, -1)
+    detour = np.where(chosen, detour_of[rows[:, :-1], rows[:, 1:]], 0.0)
+    travel = distance + detour + recharge_rate * charge
+    result = schedule(instance, rows, travel)
+    result['time_feasible'] = result.pop('feasible')
+    result.update({
+        'stations': stations,
+        'charge': charge,
+        'detour': detour.sum(axis=1),
+        'recharge_time': recharge_rate * charge.sum(axis=1),
+        'battery_feasible': feasible,
+        'feasible': feasible & result['time_feasible']
+    })
+    return result
+
+
+def plan_recharge(instance, tour, closed: bool = False) -> dict:
+    """plan_recharges para uma única rota (valores escalares/1D)"""
+    result = plan_recharges(instance, np.asarray(tour)[None, :], closed)
+    return {key: value[0] for key, value in result.items()}
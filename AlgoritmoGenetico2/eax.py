@@ -0,0 +1,286 @@
+"""
+Cruzamento por montagem de arestas (EAX, Nagata)
+
+As rotas são tratadas como ciclos não orientados sobre o depósito (nó 0) e
+os genes (1..n), guardados em arrays de adjacência (nós x 2). Para dois pais
+A e B:
+
+    1. As arestas comuns são descartadas e o restante é percorrido alternando
+       arestas de A e de B, separando os ciclos AB (ciclos fechados com
+       arestas alternadas).
+    2. Cada filho parte de A e troca as arestas de A de um ciclo AB pelas de
+       B do mesmo ciclo (estratégia "single"): os graus continuam 2, mas a
+       rota pode se partir em sub-rotas.
+    3. As sub-rotas são unidas da menor para a maior: a aresta (u, u') da
+       menor e a aresta (v, v') de outra, com v entre os vizinhos mais
+       próximos de u, são trocadas por (u, v), (u', v') ou (u, v'), (u', v)
+       pelo menor acréscimo de custo (movimento 2-opt entre sub-rotas).
+
+Vários filhos (um por ciclo AB sorteado) são gerados a partir do mesmo par
+e o mais curto é retornado. Em matrizes assimétricas as decisões usam o
+custo médio dos dois sentidos e a rota final segue o sentido mais curto.
+"""
+
+import numpy as np
+
+NEIGHBORS = 10  # vizinhos mais próximos consultados na união de sub-rotas
+CHILDREN = 5    # filhos gerados por par (um ciclo AB cada)
+
+
+class EAXCrossover:
+    def __init__(self, matrix, symmetric: bool = True, neighbors: int = NEIGHBORS,
+                 children: int = CHILDREN, rng=None, block_rows: int = 256):
+        """
+        Args:
+            matrix: Matriz de distâncias (depósito na linha 0 e genes 1..n nas demais),
+                array ou DistanceProvider; é usada como está, sem cópia densa
+            symmetric: Se a matriz é simétrica
+            neighbors: Vizinhos mais próximos de cada nó considerados na união de sub-rotas
+            children: Filhos gerados por par; o mais curto é retornado
+            rng: Gerador (ou semente) usado para sortear arestas e ciclos AB
+            block_rows: Linhas da matriz lidas por vez ao montar as listas de vizinhos
+        """
+        self.matrix = matrix
+        self.symmetric = symmetric
+        self.children = children
+        self.rng = np.random.default_rng(rng)
+
+        # Só os vizinhos mais próximos e seus custos ficam guardados (nós x neighbors)
+        size = len(matrix)
+        neighbors = max(min(neighbors, size - 1), 0)
+        self.neighbors = np.empty((size, neighbors), dtype=np.intp)
+        self.neighbor_costs = np.empty((size, neighbors))
+        nodes = np.arange(size)
+        for start in range(0, size if neighbors else 0, block_rows):
+            rows = nodes[start:start + block_rows]
+            cost = self.costs(rows[:, None], nodes[None, :])
+            cost[np.arange(len(rows)), rows] = np.inf
+            closest = np.argpartition(cost, neighbors - 1, axis=1)[:, :neighbors]
+            order = np.argsort(np.take_along_axis(cost, closest, axis=1), axis=1)
+            self.neighbors[rows] = np.take_along_axis(closest, order, axis=1)
+            self.neighbor_costs[rows] = np.take_along_axis(cost, self.neighbors[rows], axis=1)
+
+    def costs(self, u, v) -> np.ndarray:
+        """Custos de decisão entre arrays de nós (média dos dois sentidos se assimétrica)"""
+        cost = np.asarray(self.matrix[u, v], dtype=np.float64)
+        if not self.symmetric:
+            cost = (cost + np.asarray(self.matrix[v, u], dtype=np.float64)) / 2.0
+        return cost
+
+    @staticmethod
+    def adjacency(genes) -> np.ndarray:
+        """Array (nós x 2) com os vizinhos de cada nó na rota 0 -> genes -> 0"""
+        tour = np.concatenate(([0], np.asarray(genes, dtype=np.intp)))
+        adjacency = np.empty((len(tour), 2), dtype=np.intp)
+        adjacency[tour, 0] = np.roll(tour, 1)
+        adjacency[tour, 1] = np.roll(tour, -1)
+        return adjacency
+
+    @staticmethod
+    def _replace(adjacency: np.ndarray, node: int, old: int, new: int):
+        """Troca a primeira ocorrência de old entre os vizinhos de node por new"""
+        adjacency[node, 0 if adjacency[node, 0] == old else 1] = new
+
+    def tour_length(self, tour: np.ndarray) -> float:
+        """Distância da rota fechada tour (depósito nas pontas)"""
+        return float(self.matrix[tour[:-1], tour[1:]].sum(dtype=np.float64))
+
+    def ab_cycles(self, adjacency_a: np.ndarray, adjacency_b: np.ndarray) -> list:
+        """
+        Ciclos AB dos dois pais
+
+        Returns:
+            Lista de ciclos [c0, c1, ..., c0]; as arestas (c0, c1), (c2, c3), ...
+            são de A e (c1, c2), (c3, c4), ... de B
+        """
+        # Arestas só de A / só de B; -1 marca as comuns e as já percorridas
+        common = adjacency_a[:, :, None] == adjacency_b[:, None, :]
+        a_only = np.where(common.any(axis=2), -1, adjacency_a)
+        b_only = np.where(common.any(axis=1), -1, adjacency_b)
+
+        cycles = []
+        pending = np.flatnonzero((a_only >= 0).any(axis=1)).tolist()
+        while pending:
+            start = pending.pop()
+            if not (a_only[start] >= 0).any():
+                continue
+            # Caminho alternado; posições pares são chegadas por aresta de B
+            path = [start]
+            even_position = {start: 0}
+            while True:
+                node = path[-1]
+                edges = a_only if len(path) % 2 else b_only
+                first, second = edges[node].tolist()
+                if first < 0 and second < 0:
+                    break  # só ocorre de volta ao início com todas as arestas usadas
+                column = int(self.rng.integers(2)) if first >= 0 and second >= 0 else int(first < 0)
+                following = (first, second)[column]
+                edges[node, column] = -1
+                self._replace(edges, following, node, -1)
+                path.append(following)
+
+                if len(path) % 2 and following in even_position:
+                    # Chegada por B num nó já visitado em posição par: fecha um ciclo AB
+                    begin = even_position[following]
+                    cycles.append(path[begin:])
+                    for dropped in path[begin + 2::2]:
+                        even_position.pop(dropped, None)
+                    del path[begin + 1:]
+                    even_position[following] = begin
+                elif len(path) % 2:
+                    even_position[following] = len(path) - 1
+        return cycles
+
+    def _apply(self, adjacency: np.ndarray, cycle: list) -> np.ndarray:
+        """Adjacência intermediária: troca as arestas de A do ciclo pelas de B"""
+        adjacency = adjacency.copy()
+        cycle = np.asarray(cycle, dtype=np.intp)
+        # Arestas de A (c0, c1), (c2, c3), ...: cada ponta perde o vizinho do outro lado
+        nodes = np.concatenate((cycle[:-1:2], cycle[1::2]))
+        partners = np.concatenate((cycle[1::2], cycle[:-1:2]))
+        adjacency[nodes, (adjacency[nodes, 0] != partners).astype(np.intp)] = -1
+        # Arestas de B (c1, c2), (c3, c4), ..., na ordem do ciclo: ocupam as posições livres
+        nodes = np.column_stack((cycle[1:-1:2], cycle[2::2])).ravel()
+        partners = np.column_stack((cycle[2::2], cycle[1:-1:2])).ravel()
+        order = np.argsort(nodes, kind='stable')
+        nodes, partners = nodes[order], partners[order]
+        repeated = np.zeros(len(nodes), dtype=np.intp)
+        repeated[1:] = nodes[1:] == nodes[:-1]
+        adjacency[nodes, repeated + (adjacency[nodes, 0] >= 0)] = partners
+        return adjacency
+
+    @staticmethod
+    def _subtours(adjacency: np.ndarray) -> list:
+        """Sub-rotas (listas de nós) de uma adjacência de grau 2"""
+        adjacency = adjacency.tolist()
+        size = len(adjacency)
+        seen = [False] * size
+        subtours = []
+        for start in range(size):
+            if seen[start]:
+                continue
+            subtour = [start]
+            seen[start] = True
+            previous, node = start, adjacency[start][0]
+            while node != start:
+                subtour.append(node)
+                seen[node] = True
+                a, b = adjacency[node]
+                previous, node = node, (b if a == previous else a)
+            subtours.append(subtour)
+        return subtours
+
+    def _best_exchange(self, adjacency: np.ndarray, label: np.ndarray, excluded: int,
+                       u: np.ndarray, v: np.ndarray, uv_cost: np.ndarray):
+        """
+        Troca 2-opt de menor acréscimo entre as arestas dos nós u e as dos
+        candidatos v (u x candidatos), ignorando os v com rótulo excluded
+
+        Returns:
+            (acréscimo, (u, u', v, v')) com as novas arestas (u, v) e (u', v'),
+            ou None se nenhum candidato serve
+        """
+        u_next = adjacency[u]
+        v_next = adjacency[v]
+        # Eixos: u, aresta de u, candidato v, aresta de v
+        first, first_next = u[:, None, None, None], u_next[:, :, None, None]
+        second, second_next = v[:, None, :, None], v_next[:, None, :, :]
+        base = self.costs(first, first_next) + self.costs(second, second_next)
+        straight = uv_cost[:, None, :, None] + self.costs(first_next, second_next) - base
+        crossed = self.costs(first, second_next) + self.costs(first_next, second) - base
+        delta = np.stack(np.broadcast_arrays(straight, crossed), axis=-1)
+        delta[np.broadcast_to((label[v] == excluded)[:, None, :, None, None], delta.shape)] = np.inf
+        best = int(np.argmin(delta))
+        if not np.isfinite(delta.flat[best]):
+            return None
+        i, a, j, b, kind = np.unravel_index(best, delta.shape)
+        move = (u[i], u_next[i, a], v[i, j], v_next[i, j, b])
+        if kind:
+            move = (move[0], move[1], move[3], move[2])
+        return float(delta.flat[best]), tuple(int(node) for node in move)
+
+    def _merge(self, adjacency: np.ndarray, subtours: list) -> np.ndarray:
+        """Une as sub-rotas, sempre a menor com a vizinha de menor acréscimo de custo"""
+        label = np.empty(len(adjacency), dtype=np.intp)
+        for index, subtour in enumerate(subtours):
+            label[subtour] = index
+        members = dict(enumerate(subtours))
+
+        while len(members) > 1:
+            smallest = min(members, key=lambda index: len(members[index]))
+            nodes = np.asarray(members[smallest], dtype=np.intp)
+            best = self._best_exchange(adjacency, label, smallest, nodes,
+                                       self.neighbors[nodes], self.neighbor_costs[nodes])
+            if best is None:
+                # Nenhum vizinho próximo fora da sub-rota: todos os nós, um u por vez
+                others = np.flatnonzero(label != smallest)
+                for u in nodes:
+                    u = np.array([u])
+                    found = self._best_exchange(adjacency, label, smallest, u, others[None, :],
+                                                self.costs(u[:, None], others[None, :]))
+                    if found is not None and (best is None or found[0] < best[0]):
+                        best = found
+
+            u, u_next, v, v_next = best[1]
+            self._replace(adjacency, u, u_next, v)
+            self._replace(adjacency, u_next, u, v_next)
+            self._replace(adjacency, v, v_next, u)
+            self._replace(adjacency, v_next, v, u_next)
+            target = label[v]
+            label[nodes] = target
+            members[target].extend(members.pop(smallest))
+        return adjacency
+
+    def _tour(self, adjacency: np.ndarray) -> np.ndarray:
+        """Rota fechada a partir do depósito, no sentido mais curto"""
+        adjacency = adjacency.tolist()
+        tour = [0]
+        previous, node = 0, adjacency[0][1]
+        while node != 0:
+            tour.append(node)
+            a, b = adjacency[node]
+            previous, node = node, (b if a == previous else a)
+        tour.append(0)
+        tour = np.asarray(tour, dtype=np.intp)
+        if not self.symmetric and self.tour_length(tour[::-1]) < self.tour_length(tour):
+            tour = tour[::-1].copy()
+        return tour
+
+    def cross(self, parent_a, parent_b):
+        """
+        Melhor filho de EAX entre os genes parent_a e parent_b
+
+        Returns:
+            (genes do filho, distância); sem ciclos AB (mesma rota), o filho é
+            uma cópia de parent_a
+        """
+        adjacency_a = self.adjacency(parent_a)
+        cycles = self.ab_cycles(adjacency_a, self.adjacency(parent_b))
+        best_tour, best_length = None, np.inf
+        for index in self.rng.permutation(len(cycles))[:self.children].tolist():
+            adjacency = self._apply(adjacency_a, cycles[index])
+            subtours = self._subtours(adjacency)
+            if len(subtours) > 1:
+                adjacency = self._merge(adjacency, subtours)
+            tour = self._tour(adjacency)
+            length = self.tour_length(tour)
+            if length < best_length:
+                best_tour, best_length = tour, length
+
+        if best_tour is None:
+            best_tour = np.concatenate(([0], np.asarray(parent_a, dtype=np.intp), [0]))
+            best_length = self.tour_length(best_tour)
+        return best_tour[1:-1], best_length
+
+    def cross_pairs(self, parents1: np.ndarray, parents2: np.ndarray):
+        """
+        cross para cada par de linhas de dois arrays (pares x genes)
+
+        Returns:
+            (array de filhos, array de distâncias)
+        """
+        children = np.empty_like(parents1)
+        lengths = np.empty(len(parents1))
+        for k in range(len(parents1)):
+            children[k], lengths[k] = self.cross(parents1[k], parents2[k])
+        return children, lengths
@@ -0,0 +1,114 @@
+"""
+Cache de distâncias de rotas com tamanho limitado (LRU)
+
+Elitismo e cruzamentos que copiam os pais fazem as mesmas rotas reaparecerem
+a cada geração; com o cache, cada rota distinta é avaliada uma vez enquanto
+estiver entre as mais recentemente usadas.
+"""
+
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+
+class TourCache:
+    def __init__(self, maxsize: int = 10000, symmetric: bool = False):
+        """
+        Args:
+            maxsize: Número máximo de rotas guardadas (as menos usadas saem primeiro)
+            symmetric: Se a matriz é simétrica, uma rota e sua inversa têm a mesma
+                distância e passam a compartilhar a mesma entrada
+        """
+        if maxsize <= 0:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.symmetric = symmetric
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def key(self, tour) -> bytes:
+        """Hash canônico da rota (sequência de nós ou de genes)"""
+        forward = np.ascontiguousarray(tour, dtype=np.int32).tobytes()
+        if self.symmetric:
+            backward = np.ascontiguousarray(np.asarray(tour, dtype=np.int32)[::-1]).tobytes()
+            forward = min(forward, backward)
+        return hashlib.blake2b(forward, digest_size=16).digest()
+
+    def get(self, tour, key: bytes = None):
+        """Distância guardada para a rota, ou None (conta acerto/falha)"""
+        key = self.key(tour) if key is None else key
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, tour, key: bytes = None):
+        """Distância guardada para a rota, ou None (sem contar acerto/falha nem renovar a entrada)"""
+        return self._data.get(self.key(tour) if key is None else key)
+
+    def put(self, tour, value: float, key: bytes = None):
+        """Guarda a distância da rota, descartando a entrada menos usada se necessário"""
+        key = self.key(tour) if key is None else key
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def lookup(self, tour, compute):
+        """Distância da rota pelo cache, calculando com compute(tour) em caso de falha"""
+        key = self.key(tour)
+        value = self.get(tour, key)
+        if value is None:
+            value = compute(tour)
+            self.put(tour, value, key)
+        return value
+
+    def lookup_batch(self, tours: np.ndarray, compute_batch) -> np.ndarray:
+        """
+        Distâncias de um array de rotas (rotas x nós); compute_batch recebe
+        apenas as linhas que não estavam no cache
+        """
+        values = np.empty(len(tours))
+        missing = {}  # chave -> linhas com essa rota (repetidas no lote são avaliadas uma vez)
+        for i, tour in enumerate(tours):
+            key = self.key(tour)
+            if key in missing:
+                missing[key].append(i)
+                self.hits += 1
+                continue
+            value = self.get(tour, key)
+            if value is None:
+                missing[key] = [i]
+            else:
+                values[i] = value
+
+        if missing:
+            computed = compute_batch(tours[[rows[0] for rows in missing.values()]])
+            for (key, rows), value in zip(missing.items(), computed):
+                values[rows] = value
+                self.put(None, float(value), key)
+        return values
+
+    def stats(self) -> dict:
+        """Contadores de uso do cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._data),
+            'maxsize': self.maxsize
+        }
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,110 @@
+"""
+Operadores de seleção sobre um vetor de fitness
+
+Todos recebem o fitness já calculado de cada indivíduo (maior é melhor) e
+sorteiam os pais de uma geração inteira de uma vez, retornando índices:
+
+    - tournament_selection: torneios como uma matriz de índices (sorteios x
+      tamanho do torneio), reduzida com argmax; O(k) por sorteio
+    - stochastic_universal_sampling: roleta com count ponteiros igualmente
+      espaçados e um único número aleatório; O(n + count) no total
+    - roulette_selection: roleta pelo método de alias (Walker/Vose), com a
+      tabela montada em O(n) e O(1) por sorteio
+"""
+
+import numpy as np
+
+SELECTION_TYPES = ('tournament', 'sus', 'roulette')
+
+
+def tournament_selection(rng, fitness: np.ndarray, count: int, tournament_size: int = 5) -> np.ndarray:
+    """
+    Vencedores de count torneios de tournament_size indivíduos (sorteados com reposição)
+
+    Returns:
+        Índices dos vencedores
+    """
+    contenders = rng.integers(0, len(fitness), size=(count, tournament_size))
+    winners = np.argmax(fitness[contenders], axis=1)
+    return contenders[np.arange(count), winners]
+
+
+def _weights(fitness: np.ndarray) -> np.ndarray:
+    """Pesos da roleta; sem nenhum peso positivo, todos ficam iguais"""
+    weights = np.maximum(np.asarray(fitness, dtype=np.float64), 0.0)
+    if not weights.sum() > 0:
+        return np.ones(len(weights))
+    return weights
+
+
+def stochastic_universal_sampling(rng, fitness: np.ndarray, count: int) -> np.ndarray:
+    """
+    Amostragem universal estocástica (SUS)
+
+    Os ponteiros ficam a total / count uns dos outros a partir de um único
+    deslocamento aleatório, então cada indivíduo é escolhido floor ou ceil de
+    count * (sua fração do fitness) vezes. Como os ponteiros estão ordenados
+    e igualmente espaçados, quantos caem antes do fim de cada fatia da roleta
+    sai direto da soma acumulada, numa única passada: O(n + count). A saída é
+    embaralhada para que pares consecutivos não sejam sempre vizinhos na
+    população.
+
+    Returns:
+        Índices dos escolhidos
+    """
+    bounds = np.cumsum(_weights(fitness))
+    step = bounds[-1] / count
+    # Ponteiros (offset + k) * step abaixo de cada fim de fatia: k < bounds / step - offset
+    below = np.clip(np.ceil(bounds / step - rng.random()), 0, count).astype(np.intp)
+    below[-1] = count
+    chosen = np.repeat(np.arange(len(bounds)), np.diff(below, prepend=0))
+    return rng.permutation(chosen)
+
+
+def alias_table(weights: np.ndarray):
+    """
+    Tabela de alias (Vose) de uma distribuição discreta
+
+    Returns:
+        (probabilidade, alias): a casa i sorteada fica com i com
+        probabilidade[i] e com alias[i] caso contrário
+    """
+    size = len(weights)
+    scaled = np.asarray(weights, dtype=np.float64) * size / np.sum(weights)
+    probability = np.ones(size)
+    alias = np.arange(size)
+    small = np.flatnonzero(scaled < 1.0).tolist()
+    large = np.flatnonzero(scaled >= 1.0).tolist()
+    scaled = scaled.tolist()
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    # Sobras (erros de arredondamento) ficam com probabilidade 1
+    return probability, alias
+
+
+def roulette_selection(rng, fitness: np.ndarray, count: int) -> np.ndarray:
+    """
+    Roleta (probabilidade proporcional ao fitness) pelo método de alias
+
+    Returns:
+        Índices dos escolhidos
+    """
+    probability, alias = alias_table(_weights(fitness))
+    slots = rng.integers(0, len(probability), size=count)
+    return np.where(rng.random(count) < probability[slots], slots, alias[slots])
+
+
+def select(selection_type: str, rng, fitness: np.ndarray, count: int,
+           tournament_size: int = 5) -> np.ndarray:
+    """Índices de count pais pela seleção selection_type ('tournament', 'sus' ou 'roulette')"""
+    if selection_type == 'tournament':
+        return tournament_selection(rng, fitness, count, tournament_size)
+    if selection_type == 'sus':
+        return stochastic_universal_sampling(rng, fitness, count)
+    if selection_type == 'roulette':
+        return roulette_selection(rng, fitness, count)
+    raise ValueError(f"Unknown selection type: {selection_type!r} (expected one of {SELECTION_TYPES})")
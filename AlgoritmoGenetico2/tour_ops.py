@@ -0,0 +1,254 @@
+"""
+Operadores de rota com avaliação incremental
+
+Uma troca (swap) ou inversão de segmento altera no máximo quatro arestas da
+rota, então a variação da distância pode ser calculada em O(1) a partir da
+matriz, sem reavaliar a rota inteira. As rotas são fechadas: o depósito
+ocupa a primeira e a última posição e os movimentos só usam posições
+internas (1 .. len(route) - 2).
+
+Os cruzamentos trabalham em lote sobre arrays de pais (pares x genes), com
+as rotas sem o depósito (como os genes dos AGs), só com operações de array.
+"""
+
+import numpy as np
+
+
+def _nodes(route, positions, index):
+    """Linhas da matriz dos nós nas posições dadas (index mapeia nó -> linha)"""
+    if index is None:
+        return [route[p] for p in positions]
+    return [index[route[p]] for p in positions]
+
+
+def _edge_sum(matrix, edges) -> float:
+    """Soma das arestas em float (a matriz pode estar em int16/int32)"""
+    return sum(float(matrix[u, v]) for u, v in edges)
+
+
+def swap_delta(matrix, route, i: int, j: int, index=None) -> float:
+    """
+    Variação da distância ao trocar os nós das posições i e j
+
+    Args:
+        matrix: Matriz de distâncias (ou DistanceProvider)
+        route: Rota fechada (depósito nas pontas)
+        i, j: Posições internas da rota
+        index: Mapeamento opcional de nó para linha da matriz
+    """
+    if i == j:
+        return 0.0
+    if i > j:
+        i, j = j, i
+    before_i, a, after_i, before_j, b, after_j = _nodes(
+        route, (i - 1, i, i + 1, j - 1, j, j + 1), index)
+
+    if j == i + 1:
+        # Posições vizinhas: as arestas (a, b) e (b, a) trocam de sentido
+        removed = ((before_i, a), (a, b), (b, after_j))
+        added = ((before_i, b), (b, a), (a, after_j))
+    else:
+        removed = ((before_i, a), (a, after_i), (before_j, b), (b, after_j))
+        added = ((before_i, b), (b, after_i), (before_j, a), (a, after_j))
+    return _edge_sum(matrix, added) - _edge_sum(matrix, removed)
+
+
+def inversion_delta(matrix, route, i: int, j: int, symmetric: bool = True, index=None) -> float:
+    """
+    Variação da distância ao inverter o segmento route[i..j] (inclusive)
+
+    Com matriz simétrica só as duas arestas das pontas mudam (O(1)); com
+    matriz assimétrica as arestas internas também mudam de sentido e são
+    somadas com um gather sobre o segmento.
+    """
+    if i == j:
+        return 0.0
+    if i > j:
+        i, j = j, i
+    before, first, last, after = _nodes(route, (i - 1, i, j, j + 1), index)
+    delta = (float(matrix[before, last]) + float(matrix[first, after])
+             - float(matrix[before, first]) - float(matrix[last, after]))
+
+    if not symmetric:
+        segment = np.asarray(_nodes(route, range(i, j + 1), index), dtype=np.intp)
+        forward = matrix[segment[:-1], segment[1:]].sum(dtype=np.float64)
+        backward = matrix[segment[1:], segment[:-1]].sum(dtype=np.float64)
+        delta += float(backward) - float(forward)
+    return delta
+
+
+def apply_swap(route, i: int, j: int):
+    """Troca os nós das posições i e j (no próprio objeto)"""
+    route[i], route[j] = route[j], route[i]
+    return route
+
+
+def apply_inversion(route, i: int, j: int):
+    """Inverte o segmento route[i..j] (no próprio objeto)"""
+    if i > j:
+        i, j = j, i
+    route[i:j + 1] = route[i:j + 1][::-1]
+    return route
+
+
+MUTATION_TYPES = ('swap', 'inversion')
+
+
+def mutation_delta(mutation_type: str, matrix, route, i: int, j: int,
+                   symmetric: bool = True, index=None) -> float:
+    """Variação da distância do movimento mutation_type ('swap' ou 'inversion')"""
+    if mutation_type == 'swap':
+        return swap_delta(matrix, route, i, j, index)
+    if mutation_type == 'inversion':
+        return inversion_delta(matrix, route, i, j, symmetric, index)
+    raise ValueError(f"Unknown mutation type: {mutation_type!r} (expected one of {MUTATION_TYPES})")
+
+
+def apply_mutation(mutation_type: str, route, i: int, j: int):
+    """Aplica o movimento mutation_type na rota (no próprio objeto)"""
+    if mutation_type == 'swap':
+        return apply_swap(route, i, j)
+    if mutation_type == 'inversion':
+        return apply_inversion(route, i, j)
+    raise ValueError(f"Unknown mutation type: {mutation_type!r} (expected one of {MUTATION_TYPES})")
+
+
+def random_cuts(rng, count: int, size: int):
+    """
+    Pontos de corte [start, end) distintos para count pares de rotas de size genes
+
+    Returns:
+        (start, end), arrays com 0 <= start < end <= size
+    """
+    first = rng.integers(0, size + 1, size=count)
+    second = rng.integers(0, size, size=count)
+    second += second >= first
+    return np.minimum(first, second), np.maximum(first, second)
+
+
+def order_crossover(parents1: np.ndarray, parents2: np.ndarray,
+                    start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    Cruzamento por ordem (OX) em lote
+
+    O filho k recebe o segmento [start[k], end[k]) de parents1[k] nas mesmas
+    posições; as demais posições, da esquerda para a direita, recebem os genes
+    que faltam na ordem em que aparecem em parents2[k].
+
+    Args:
+        parents1, parents2: Arrays (pares x genes) de permutações dos mesmos
+            inteiros não negativos
+        start, end: Pontos de corte de cada par (ver random_cuts)
+
+    Returns:
+        Array (pares x genes) com os filhos
+    """
+    count, size = parents1.shape
+    rows = np.arange(count)[:, None]
+    columns = np.arange(size)
+    segment = (columns >= start[:, None]) & (columns < end[:, None])
+
+    # Posição de cada gene em parents1: diz quais genes de parents2 já vêm do segmento
+    copied = segment[rows, _gene_positions(parents1)[rows, parents2]]
+
+    # Ordenações estáveis põem as posições livres e os genes que faltam primeiro,
+    # na ordem original; o restante de cada linha é sobrescrito pelo segmento
+    free = np.argsort(segment, axis=1, kind='stable')
+    missing = np.argsort(copied, axis=1, kind='stable')
+    children = np.empty_like(parents1)
+    children[rows, free] = parents2[rows, missing]
+    children[segment] = parents1[segment]
+    return children
+
+
+def _gene_positions(parents: np.ndarray) -> np.ndarray:
+    """Posição de cada gene em cada linha: positions[k, parents[k, c]] = c"""
+    count, size = parents.shape
+    positions = np.empty((count, int(parents.max()) + 1), dtype=np.intp)
+    positions[np.arange(count)[:, None], parents] = np.arange(size)
+    return positions
+
+
+def partially_mapped_crossover(parents1: np.ndarray, parents2: np.ndarray,
+                               start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    Cruzamento parcialmente mapeado (PMX) em lote
+
+    O filho k recebe o segmento [start[k], end[k]) de parents1[k] e as demais
+    posições de parents2[k]; um gene de fora que repete um do segmento é
+    trocado seguindo o mapeamento do segmento (parents1 -> parents2) até sair
+    dele. Todas as linhas avançam juntas, no máximo um passo por gene do segmento.
+
+    Args:
+        parents1, parents2: Arrays (pares x genes) de permutações dos mesmos
+            inteiros não negativos
+        start, end: Pontos de corte de cada par (ver random_cuts)
+
+    Returns:
+        Array (pares x genes) com os filhos
+    """
+    count, size = parents1.shape
+    rows = np.arange(count)[:, None]
+    columns = np.arange(size)
+    segment = (columns >= start[:, None]) & (columns < end[:, None])
+    position = _gene_positions(parents1)
+
+    children = np.where(segment, parents1, parents2)
+    conflict = ~segment & segment[rows, position[rows, children]]
+    while conflict.any():
+        row, column = np.nonzero(conflict)
+        mapped = parents2[row, position[row, children[row, column]]]
+        children[row, column] = mapped
+        conflict[row, column] = segment[row, position[row, mapped]]
+    return children
+
+
+def cycle_crossover(parents1: np.ndarray, parents2: np.ndarray) -> np.ndarray:
+    """
+    Cruzamento cíclico (CX) em lote
+
+    As posições se dividem nos ciclos da permutação c -> posição de
+    parents2[c] em parents1; o filho copia parents1 nos ciclos de ordem par
+    (o que contém a posição 0 é o primeiro) e parents2 nos demais, então cada
+    gene fica na posição que tinha num dos pais. O menor índice de cada ciclo
+    é encontrado por saltos de ponteiro (O(n log n) por linha).
+
+    Args:
+        parents1, parents2: Arrays (pares x genes) de permutações dos mesmos
+            inteiros não negativos
+
+    Returns:
+        Array (pares x genes) com os filhos
+    """
+    count, size = parents1.shape
+    rows = np.arange(count)[:, None]
+    columns = np.arange(size)
+    successor = _gene_positions(parents1)[rows, parents2]
+
+    first = np.broadcast_to(columns, (count, size)).copy()
+    for _ in range(max(size - 1, 1).bit_length()):
+        first = np.minimum(first, first[rows, successor])
+        successor = successor[rows, successor]
+
+    cycle = np.cumsum(first == columns, axis=1) - 1
+    from_first = cycle[rows, first] % 2 == 0
+    return np.where(from_first, parents1, parents2)
+
+
+CROSSOVER_TYPES = ('order', 'pmx', 'cycle')
+
+
+def apply_crossover(crossover_type: str, parents1: np.ndarray, parents2: np.ndarray,
+                    start: np.ndarray = None, end: np.ndarray = None) -> np.ndarray:
+    """
+    Filhos do cruzamento crossover_type ('order', 'pmx' ou 'cycle') de cada par
+
+    Os pontos de corte são ignorados pelo cruzamento cíclico.
+    """
+    if crossover_type == 'order':
+        return order_crossover(parents1, parents2, start, end)
+    if crossover_type == 'pmx':
+        return partially_mapped_crossover(parents1, parents2, start, end)
+    if crossover_type == 'cycle':
+        return cycle_crossover(parents1, parents2)
+    raise ValueError(f"Unknown crossover type: {crossover_type!r} (expected one of {CROSSOVER_TYPES})")
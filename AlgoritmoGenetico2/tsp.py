@@ -1,14 +1,69 @@
 from typing import List, Dict, Tuple
-from instance_reader import ETSPInstance
+from instance_reader import ETSPInstance, NODE_CUSTOMER
+from fitness_cache import TourCache
+from tour_ops import (MUTATION_TYPES, CROSSOVER_TYPES, mutation_delta, apply_mutation,
+                      random_cuts, apply_crossover)
+from time_windows import evaluate_time_windows
+from battery import evaluate_battery, plan_recharges
+from arc_filter import infeasible_arc_counts, move_adds_infeasible_arc, random_feasible_tours
+from selection import SELECTION_TYPES, select
+from eax import EAXCrossover
 import math
 import random
 import numpy as np
 import matplotlib.pyplot as plt
 
 
+class Population:
+    """
+    População guardada num único array contíguo (indivíduos x clientes)
+
+    Cada linha é uma rota com o depósito implícito nas pontas, representada
+    pelos índices das cidades (1..n, linhas da matriz de distâncias) em
+    int16/int32. A distância de cada indivíduo fica em distances; NaN marca
+    os indivíduos ainda não avaliados, que são avaliados juntos, em lote.
+    """
+    
+    def __init__(self, genes: np.ndarray, distances: np.ndarray = None,
+                 cities: np.ndarray = None):
+        """
+        Args:
+            genes: Array (indivíduos x clientes) com as rotas
+            distances: Distância de cada indivíduo (NaN = a avaliar); None = nenhuma conhecida
+            cities: IDs dos nós por índice de cidade (para montar as rotas)
+        """
+        self.genes = genes
+        self.distances = np.full(len(genes), np.nan) if distances is None else distances
+        self.cities = cities
+    
+    def pending(self) -> np.ndarray:
+        """Índices dos indivíduos ainda sem distância"""
+        return np.flatnonzero(np.isnan(self.distances))
+    
+    def route(self, index: int) -> List[int]:
+        """Rota do indivíduo index como lista de IDs, com o depósito nas pontas"""
+        depot = int(self.cities[0])
+        return [depot] + self.cities[self.genes[index]].tolist() + [depot]
+    
+    def fitness(self) -> np.ndarray:
+        """Fitness (inverso da distância) de todos os indivíduos"""
+        return np.divide(1.0, self.distances, out=np.zeros_like(self.distances),
+                         where=self.distances > 0)
+    
+    def ranking(self) -> np.ndarray:
+        """Índices dos indivíduos da menor para a maior distância"""
+        return np.argsort(self.distances, kind='stable')
+    
+    def __len__(self) -> int:
+        return len(self.genes)
+
+
 class TSPGeneticAlgorithm:
     def __init__(self, instance: ETSPInstance, population_size: int = 100, mutation_rate: float = 0.01, 
-                 crossover_rate: float = 0.8, max_generations: int = 1000, elitism_count: int = 5):
+                 crossover_rate: float = 0.8, max_generations: int = 1000, elitism_count: int = 5,
+                 cache_size: int = None, mutation_type: str = 'swap', arc_pruning: bool = False,
+                 seed: int = None, selection_type: str = 'tournament', crossover_type: str = 'order',
+                 report_etsptw: bool = False):
         """
         Inicializa o algoritmo genético para TSP
         
@@ -19,7 +74,33 @@ class TSPGeneticAlgorithm:
             crossover_rate: Taxa de cruzamento
             max_generations: Número máximo de gerações
             elitism_count: Número de indivíduos mantidos por elitismo
+            cache_size: Se informado, guarda as distâncias das últimas cache_size
+                rotas distintas (LRU) e evita reavaliá-las
+            mutation_type: 'swap' (troca de duas cidades) ou 'inversion'
+                (inversão de um segmento); ambas informam a variação da
+                distância calculada só com as arestas alteradas
+            arc_pruning: Se True, consulta a máscara de arcos viáveis pelas janelas
+                de tempo (ETSPInstance.arc_mask): a população inicial é construída
+                por arcos permitidos, mutações que criam arcos proibidos são
+                descartadas e filhos com mais arcos proibidos que o melhor pai
+                dão lugar a cópias dos pais (sem nova avaliação)
+            seed: Semente do gerador do AG; se None, é tirada do módulo random
+                (random.seed continua tornando a execução reprodutível)
+            selection_type: 'tournament' (torneios de 5), 'sus' (amostragem
+                universal estocástica) ou 'roulette' (roleta pelo método de alias)
+            crossover_type: 'order' (OX), 'pmx', 'cycle' (CX) ou 'eax' (montagem de
+                arestas, ver eax.py; já informa a distância dos filhos)
+            report_etsptw: Se True, o resultado inclui as janelas de tempo, a
+                bateria e o plano de recarga da melhor rota; bateria e plano são
+                omitidos em instâncias sem estações ou sem limite de carga
         """
+        if mutation_type not in MUTATION_TYPES:
+            raise ValueError(f"Unknown mutation type: {mutation_type!r} (expected one of {MUTATION_TYPES})")
+        if crossover_type not in CROSSOVER_TYPES + ('eax',):
+            raise ValueError(f"Unknown crossover type: {crossover_type!r} "
+                             f"(expected one of {CROSSOVER_TYPES + ('eax',)})")
+        if selection_type not in SELECTION_TYPES:
+            raise ValueError(f"Unknown selection type: {selection_type!r} (expected one of {SELECTION_TYPES})")
         self.instance = instance
         
         # Parâmetros do AG
@@ -28,10 +109,27 @@ class TSPGeneticAlgorithm:
         self.crossover_rate = crossover_rate
         self.max_generations = max_generations
         self.elitism_count = elitism_count
+        self.mutation_type = mutation_type
+        self.selection_type = selection_type
+        self.crossover_type = crossover_type
+        self.report_etsptw = report_etsptw
+        self.rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
         
         # Conjuntos de vértices (apenas clientes + depósito)
         self.cities = self._define_cities()
+        self.city_index = {city: i for i, city in enumerate(self.cities)}
+        self.city_ids = np.asarray(self.cities)
+        self.num_genes = len(self.cities) - 1
+        # Índices de cidade nos genes: int16 enquanto couberem
+        self.gene_dtype = np.int16 if len(self.cities) <= np.iinfo(np.int16).max else np.int32
         self.distance_matrix = self._create_distance_matrix()
+        self.symmetric = instance.is_symmetric()
+        self.cache = TourCache(cache_size, self.symmetric) if cache_size else None
+        # Depósito e clientes ocupam as linhas 0..n da instância, então os índices de
+        # cidade também indexam a máscara de arcos
+        self.arc_mask = instance.arc_mask() if arc_pruning else None
+        self.eax = (EAXCrossover(self.distance_matrix, self.symmetric, rng=self.rng)
+                    if crossover_type == 'eax' else None)
         
         # Estatísticas de execução
         self.best_fitness_history = []
@@ -43,156 +141,239 @@ class TSPGeneticAlgorithm:
         """Define as cidades (depósito + clientes) para o TSP clássico"""
         # Incluir apenas depósito e clientes (sem estações de recarga)
         cities = [0]  # Depósito sempre é o nó 0
-        cities.extend([node['id'] for node in self.instance.nodes 
-                      if 1 <= node['id'] <= self.instance.n])  # Apenas clientes
+        cities.extend(self.instance.ids[self.instance.kind == NODE_CUSTOMER].tolist())  # Apenas clientes
         return cities
     
     def _create_distance_matrix(self) -> np.ndarray:
         """Cria matriz de distâncias entre todas as cidades"""
-        n_cities = len(self.cities)
-        matrix = np.zeros((n_cities, n_cities))
-        
-        for i, city_i in enumerate(self.cities):
-            for j, city_j in enumerate(self.cities):
-                if i != j:
-                    matrix[i][j] = self.instance.get_distance(city_i, city_j)
-        
-        return matrix
+        # View (ou uma única cópia indexada) da matriz da instância. A diagonal
+        # mantém o valor do arquivo, mas nunca é usada por uma rota.
+        return self.instance.submatrix(self.cities)
     
     def calculate_route_distance(self, route: List[int]) -> float:
         """Calcula a distância total de uma rota"""
-        total_distance = 0.0
-        
-        for i in range(len(route) - 1):
-            city_idx_from = self.cities.index(route[i])
-            city_idx_to = self.cities.index(route[i + 1])
-            total_distance += self.distance_matrix[city_idx_from][city_idx_to]
-        
-        return total_distance
+        indices = [self.city_index[city] for city in route]
+        return float(self.distance_matrix[indices[:-1], indices[1:]].sum(dtype=np.float64))
+    
+    def tour_lengths(self, genes: np.ndarray) -> np.ndarray:
+        """Distância de cada linha de um array de genes (depósito implícito), num único gather"""
+        routes = self._with_depot(genes)
+        return self.distance_matrix[routes[:, :-1], routes[:, 1:]].sum(axis=1, dtype=np.float64)
+    
+    def evaluate_genes(self, genes: np.ndarray) -> np.ndarray:
+        """Distâncias de um array de genes, consultando o cache quando habilitado"""
+        if self.cache is not None:
+            return self.cache.lookup_batch(genes, self.tour_lengths)
+        return self.tour_lengths(genes)
+    
+    def _evaluate_pending(self, population: Population):
+        """Avalia de uma vez todos os indivíduos da população ainda sem distância"""
+        pending = population.pending()
+        if len(pending):
+            population.distances[pending] = self.evaluate_genes(population.genes[pending])
+    
+    @staticmethod
+    def _with_depot(genes: np.ndarray) -> np.ndarray:
+        """Rotas fechadas (índice 0 nas pontas) a partir de um array de genes"""
+        routes = np.zeros((len(genes), genes.shape[1] + 2), dtype=np.intp)
+        routes[:, 1:-1] = genes
+        return routes
+    
+    def evaluate_time_windows(self, individuals: List[List[int]]) -> Dict:
+        """Chegadas, espera, atraso e viabilidade das janelas de tempo de vários indivíduos"""
+        return evaluate_time_windows(self.instance, np.asarray(individuals), closed=True)
+    
+    def evaluate_battery(self, individuals: List[List[int]]) -> Dict:
+        """Estado de carga, recargas necessárias e viabilidade da bateria de vários indivíduos"""
+        return evaluate_battery(self.instance, np.asarray(individuals), closed=True)
+    
+    def _reports_battery(self) -> bool:
+        """Se o relatório inclui a bateria (habilitado, com estações e carga limitada)"""
+        return self.report_etsptw and self.instance.m > 0 and np.isfinite(self.instance.Q)
+    
+    def plan_recharges(self, individuals: List[List[int]]) -> Dict:
+        """Paradas de recarga de menor desvio e agenda resultante de vários indivíduos"""
+        return plan_recharges(self.instance, np.asarray(individuals), closed=True)
     
     def fitness(self, individual: List[int]) -> float:
         """Função de fitness (inverso da distância total)"""
-        distance = self.calculate_route_distance(individual)
+        return self._distance_to_fitness(self.calculate_route_distance(individual))
+    
+    @staticmethod
+    def _distance_to_fitness(distance: float) -> float:
         return 1.0 / distance if distance > 0 else 0.0
     
-    def create_individual(self) -> List[int]:
-        """Cria um indivíduo (rota) aleatório"""
-        # Começar e terminar no depósito (0), embaralhar as outras cidades
-        cities_to_visit = self.cities[1:]  # Excluir depósito
-        random.shuffle(cities_to_visit)
-        return [0] + cities_to_visit + [0]
-    
-    def create_population(self) -> List[List[int]]:
-        """Cria a população inicial"""
-        return [self.create_individual() for _ in range(self.population_size)]
-    
-    def tournament_selection(self, population: List[List[int]], tournament_size: int = 5) -> List[int]:
-        """Seleção por torneio"""
-        tournament = random.sample(population, tournament_size)
-        return max(tournament, key=self.fitness)
-    
-    def order_crossover(self, parent1: List[int], parent2: List[int]) -> Tuple[List[int], List[int]]:
-        """Cruzamento por ordem (OX)"""
-        size = len(parent1) - 2  # Excluir depósitos inicial e final
+    def create_population(self) -> Population:
+        """Cria e avalia a população inicial (uma permutação aleatória por linha)"""
+        if self.arc_mask is not None:
+            genes = random_feasible_tours(self.instance, self.population_size, self.rng)
+        else:
+            customers = np.arange(1, self.num_genes + 1)
+            genes = self.rng.permuted(np.tile(customers, (self.population_size, 1)), axis=1)
+        population = Population(np.ascontiguousarray(genes, dtype=self.gene_dtype),
+                                cities=self.city_ids)
+        self._evaluate_pending(population)
+        return population
+    
+    def select_parents(self, population: Population, count: int) -> np.ndarray:
+        """Índices de count pais pela seleção configurada (usa o fitness já calculado)"""
+        return select(self.selection_type, self.rng, population.fitness(), count)
+    
+    def crossover(self, parents1: np.ndarray, parents2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cruzamento (OX, PMX ou CX) entre pares de linhas de genes, todos de uma vez"""
+        if self.num_genes <= 2:
+            return parents1.copy(), parents2.copy()
         
-        if size <= 2:
-            return parent1.copy(), parent2.copy()
+        # Dois pontos de corte aleatórios por par: o segmento [start, end) vem do próprio pai
+        start, end = random_cuts(self.rng, len(parents1), self.num_genes)
         
-        # Selecionar dois pontos de corte aleatórios
-        start, end = sorted(random.sample(range(1, size + 1), 2))
+        children1 = apply_crossover(self.crossover_type, parents1, parents2, start, end)
+        children2 = apply_crossover(self.crossover_type, parents2, parents1, start, end)
+        return children1, children2
+    
+    def _prune_children(self, parents: np.ndarray, parent_distances: np.ndarray,
+                        children: np.ndarray, distances: np.ndarray, crossed: np.ndarray):
+        """
+        Filhos de cruzamento com mais arcos proibidos que o melhor dos pais são
+        trocados (no próprio array) por cópias dos pais, que mantêm a distância
+        já calculada
         
-        # Criar filhos
-        child1 = [0] + [None] * size + [0]
-        child2 = [0] + [None] * size + [0]
+        Args:
+            parents, children: Arrays (2 * pares x clientes) com pai/filho 1 e 2 de cada par intercalados
+            crossed: Pares em que houve cruzamento
+        """
+        counts = infeasible_arc_counts(self.arc_mask, self._with_depot(np.vstack([parents, children])))
+        parent_counts, child_counts = np.split(counts, 2)
+        limit = np.minimum(parent_counts[0::2], parent_counts[1::2]).repeat(2)
+        revert = np.flatnonzero((child_counts > limit) & crossed.repeat(2))
+        children[revert] = parents[revert]
+        distances[revert] = parent_distances[revert]
+    
+    def mutate(self, routes: np.ndarray) -> np.ndarray:
+        """
+        Mutação (troca de duas cidades ou inversão de segmento) de um array de
+        rotas fechadas (depósito nas pontas), no próprio array
         
-        # Copiar segmento do pai 1 para filho 1 e pai 2 para filho 2
-        child1[start:end] = parent1[start:end]
-        child2[start:end] = parent2[start:end]
+        A variação da distância de cada rota é calculada só com as arestas
+        alteradas pelo movimento (O(1)); é 0.0 para rotas não mutadas.
         
-        # Completar os filhos
-        self._complete_child(child1, parent2, start, end)
-        self._complete_child(child2, parent1, start, end)
+        Returns:
+            Variação da distância de cada rota
+        """
+        count, length = routes.shape
+        deltas = np.zeros(count)
+        if length <= 4:
+            return deltas
+        
+        # Duas posições distintas (excluindo depósitos) por rota sorteada
+        chosen = np.flatnonzero(self.rng.random(count) < self.mutation_rate)
+        first = self.rng.integers(1, length - 1, size=len(chosen))
+        second = self.rng.integers(1, length - 2, size=len(chosen))
+        second += second >= first
         
-        return child1, child2
+        for row, i, j in zip(chosen.tolist(), first.tolist(), second.tolist()):
+            route = routes[row]
+            if self.arc_mask is not None and move_adds_infeasible_arc(
+                    self.arc_mask, route, i, j, self.mutation_type):
+                continue  # movimento descartado: criaria um arco proibido
+            deltas[row] = mutation_delta(self.mutation_type, self.distance_matrix, route, i, j,
+                                         self.symmetric)
+            apply_mutation(self.mutation_type, route, i, j)
+        return deltas
     
-    def _complete_child(self, child: List[int], parent: List[int], start: int, end: int):
-        """Completa o filho no cruzamento OX"""
-        child_set = set(child[start:end])
-        parent_genes = [gene for gene in parent[1:-1] if gene not in child_set]
+    def next_generation(self, population: Population, ranking: np.ndarray) -> Population:
+        """
+        Nova população: elitismo, seleção, cruzamento e mutação sobre linhas
+        de arrays; no fim, só os indivíduos sem distância conhecida são avaliados
+        """
+        elite = ranking[:self.elitism_count]
+        count = self.population_size - len(elite)
+        pairs = (count + 1) // 2
+        
+        # Pais intercalados: linhas 2k e 2k + 1 formam o par k
+        selected = self.select_parents(population, 2 * pairs)
+        parents = population.genes[selected]
+        parent_distances = population.distances[selected]
         
-        # Preencher posições vazias
-        gene_idx = 0
-        for i in range(1, len(child) - 1):
-            if child[i] is None:
-                child[i] = parent_genes[gene_idx]
-                gene_idx += 1
-    
-    def mutate(self, individual: List[int]) -> List[int]:
-        """Mutação por troca de duas cidades"""
-        mutated = individual.copy()
+        children = parents.copy()
+        distances = parent_distances.copy()  # cópias dos pais herdam a distância
+        crossed = self.rng.random(pairs) < self.crossover_rate
+        if crossed.any():
+            first = 2 * np.flatnonzero(crossed)
+            second = first + 1
+            if self.eax is not None:
+                # EAX par a par, nos dois sentidos; as distâncias dos filhos já vêm calculadas
+                children[first], distances[first] = self.eax.cross_pairs(parents[first], parents[second])
+                children[second], distances[second] = self.eax.cross_pairs(parents[second], parents[first])
+            else:
+                children[first], children[second] = self.crossover(parents[first], parents[second])
+                distances[crossed.repeat(2)] = np.nan
+        if self.arc_mask is not None and crossed.any():
+            self._prune_children(parents, parent_distances, children, distances, crossed)
         
-        if random.random() < self.mutation_rate and len(mutated) > 4:
-            # Escolher duas posições aleatórias (excluindo depósitos)
-            i, j = random.sample(range(1, len(mutated) - 1), 2)
-            mutated[i], mutated[j] = mutated[j], mutated[i]
+        # Mutação sobre as rotas fechadas; a distância conhecida recebe a variação
+        routes = self._with_depot(children)
+        distances += self.mutate(routes)
+        children = routes[:count, 1:-1].astype(self.gene_dtype)
         
-        return mutated
+        new_population = Population(
+            np.concatenate([population.genes[elite], children]),
+            np.concatenate([population.distances[elite], distances[:count]]),
+            cities=self.city_ids)
+        self._evaluate_pending(new_population)
+        return new_population
+    
     def evolve(self) -> Dict:
         """Executa o algoritmo genético"""
         population = self.create_population()
         
         for generation in range(self.max_generations):
-            # Avaliar população
-            fitness_scores = [(individual, self.fitness(individual)) for individual in population]
-            fitness_scores.sort(key=lambda x: x[1], reverse=True)
+            # Ordenar população (distâncias já calculadas na criação dos indivíduos)
+            ranking = population.ranking()
             
             # Atualizar melhor indivíduo
-            best_individual_gen = fitness_scores[0][0]
-            best_distance_gen = self.calculate_route_distance(best_individual_gen)
+            best_gen = ranking[0]
+            best_distance_gen = float(population.distances[best_gen])
             
             if best_distance_gen < self.best_distance:
                 self.best_distance = best_distance_gen
-                self.best_individual = best_individual_gen.copy()
+                self.best_individual = population.route(best_gen)
             
             # Registrar estatísticas
-            self.best_fitness_history.append(fitness_scores[0][1])
-            avg_fitness = sum(score[1] for score in fitness_scores) / len(fitness_scores)
-            self.avg_fitness_history.append(avg_fitness)
+            fitness_scores = population.fitness()
+            self.best_fitness_history.append(self._distance_to_fitness(best_distance_gen))
+            self.avg_fitness_history.append(float(fitness_scores.mean()))
             
             # Critério de parada
             if generation % 100 == 0:
                 print(f"Geração {generation}: Melhor distância = {self.best_distance:.2f}")
             
-            # Criar nova população
-            new_population = []
-            
-            # Elitismo
-            for i in range(self.elitism_count):
-                new_population.append(fitness_scores[i][0])
-            
-            # Gerar novos indivíduos
-            while len(new_population) < self.population_size:
-                parent1 = self.tournament_selection(population)
-                parent2 = self.tournament_selection(population)
-                
-                if random.random() < self.crossover_rate:
-                    child1, child2 = self.order_crossover(parent1, parent2)
-                else:
-                    child1, child2 = parent1.copy(), parent2.copy()
-                
-                child1 = self.mutate(child1)
-                child2 = self.mutate(child2)
-                
-                new_population.extend([child1, child2])
-            
-            population = new_population[:self.population_size]
+            population = self.next_generation(population, ranking)
         
-        return {
+        results = {
             'best_individual': self.best_individual,
             'best_distance': self.best_distance,
             'best_fitness_history': self.best_fitness_history,
             'avg_fitness_history': self.avg_fitness_history
         }
+        if self.report_etsptw:
+            windows = self.evaluate_time_windows([self.best_individual])
+            results['time_windows'] = {key: windows[key][0].item()
+                                       for key in ('waiting', 'lateness', 'late_visits', 'feasible')}
+        if self._reports_battery():
+            battery = self.evaluate_battery([self.best_individual])
+            results['battery'] = {key: battery[key][0].item()
+                                  for key in ('violations', 'detour', 'recharge_time', 'feasible')}
+            plan = self.plan_recharges([self.best_individual])
+            results['recharge_plan'] = {
+                'stations': [int(station) for station in plan['stations'][0] if station >= 0],
+                **{key: plan[key][0].item() for key in ('detour', 'recharge_time', 'duration',
+                                                        'lateness', 'battery_feasible', 'feasible')}
+            }
+        if self.cache is not None:
+            results['cache_stats'] = self.cache.stats()
+        
+        return results
     
     def plot_convergence(self):
         """Plota gráfico de convergência do algoritmo"""